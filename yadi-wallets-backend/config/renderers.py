@@ -0,0 +1,76 @@
+"""
+Project-wide JSON renderer and parser on orjson (see REST_FRAMEWORK in settings).
+
+orjson writes dicts, lists, str/int/float, UUID and datetime natively, in C.
+Money stays exact: Decimal is rendered as its string ("1500.00"), never as a
+float. Anything else falls back to DRF's encoder rules (lazy strings, dates,
+querysets, ...).
+"""
+from decimal import Decimal
+
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Same wire format as DRF's encoder for what orjson handles itself ('Z' for UTC)
+DUMPS_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _fallback.default(obj)
+
+
+def dumps(data, indent=False):
+    """JSON bytes for an API payload, outside DRF responses too."""
+    return orjson.dumps(data, default=_default, option=DUMPS_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """application/json via orjson (Decimal as string). ?format=json / indent=N still work."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # orjson only knows one indent (2 spaces): any requested indent pretty-prints
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent=bool(indent))
+
+
+class ORJSONParser(JSONParser):
+    """application/json request bodies via orjson."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return None
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f'JSON parse error - {e}')
+
+
+# --- EXPORT FORMATS ---
+# Streamed exports (finance.statements) write their own body; these renderers
+# only let ?format=csv|ndjson through content negotiation. Anything they do
+# render (errors) goes out as JSON.
+class ExportRenderer(ORJSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -2,6 +2,7 @@ from pathlib import Path
 from decouple import config, Csv
 import dj_database_url
 from datetime import timedelta
+from celery.schedules import crontab
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -91,8 +92,24 @@ DATABASES = {
     )
 }
 
+# --- CACHE & REDIS ---
+# Shared by web and worker processes (fee schedule version, metrics, rate limits).
+# CACHE_URL=locmem:// gives a per-process cache for local runs without Redis.
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+CACHE_URL = config('CACHE_URL', default=REDIS_URL)
+if CACHE_URL == 'locmem://':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+
 # --- AUTHENTICATION ---
 AUTH_USER_MODEL = 'users.User'
+
+# Service API keys (integrations.authentication): verified against an in-process LRU,
+# then the shared cache, then the DB. Admin revocation evicts all three at once.
+SERVICE_KEY_LRU_SIZE = config('SERVICE_KEY_LRU_SIZE', default=256, cast=int)
+SERVICE_KEY_LRU_TTL = config('SERVICE_KEY_LRU_TTL', default=30, cast=int)
+SERVICE_KEY_CACHE_TTL = config('SERVICE_KEY_CACHE_TTL', default=300, cast=int)
 SITE_ID = 1 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
@@ -108,6 +125,7 @@ REST_AUTH = {
     'JWT_AUTH_COOKIE': 'yadi-wallet-auth',
     'JWT_AUTH_REFRESH_COOKIE': 'yadi-wallet-refresh',
     'USER_DETAILS_SERIALIZER': 'users.serializers.UserProfileSerializer',
+    'JWT_TOKEN_CLAIMS_SERIALIZER': 'users.authentication.WalletTokenClaimsSerializer',
 }
 
 SIMPLE_JWT = {
@@ -115,6 +133,10 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Finance endpoints build request.user from JWT claims (id, username, KYC flag, token version)
+# instead of loading the user row; a token_version bump sends stale tokens back to the DB.
+JWT_STATELESS_USER = config('JWT_STATELESS_USER', default=True, cast=bool)
+
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
         'APP': {
@@ -128,6 +150,20 @@ SOCIALACCOUNT_PROVIDERS = {
 }
 SOCIALACCOUNT_ADAPTER = 'users.adapters.WalletSocialAdapter'
 
+# --- REST FRAMEWORK ---
+# JSON in and out via orjson (config.renderers): Decimal money is rendered as an exact string
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 # --- STATIC ---
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -136,6 +172,68 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# --- LEDGER ---
+# Number of shard rows for the hot system wallets (MASTER, REVENUE, SUSPENSE).
+# Re-run `python manage.py init_wallets` after raising it.
+SYSTEM_WALLET_SHARDS = config('SYSTEM_WALLET_SHARDS', default=8, cast=int)
+
+# Deferred mode: system-wallet legs go to an append-only journal and are folded
+# into Wallet.balance by the rollup task every LEDGER_ROLLUP_INTERVAL seconds.
+LEDGER_DEFER_SYSTEM_POSTINGS = config('LEDGER_DEFER_SYSTEM_POSTINGS', default=False, cast=bool)
+LEDGER_ROLLUP_INTERVAL = config('LEDGER_ROLLUP_INTERVAL', default=5.0, cast=float)
+
+# Statement exports stream entries from a server-side cursor, this many rows per fetch
+STATEMENT_CHUNK_SIZE = config('STATEMENT_CHUNK_SIZE', default=2000, cast=int)
+
+# Daily per-wallet balance checkpoints (BalanceService), built by an hourly job for every
+# local day that ended LAG minutes ago; point-in-time balances only scan entries after them
+BALANCE_CHECKPOINT_LAG_MINUTES = config('BALANCE_CHECKPOINT_LAG_MINUTES', default=10, cast=int)
+BALANCE_CHECKPOINT_BATCH_DAYS = config('BALANCE_CHECKPOINT_BATCH_DAYS', default=7, cast=int)
+
+# Month-end organizer statements (finance.statement_runs): gzipped CSVs under MEDIA_ROOT/<dir>/<YYYY-MM>/,
+# rendered as STATEMENT_SHARDS parallel Celery tasks on the 1st of each month
+STATEMENT_ARCHIVE_DIR = config('STATEMENT_ARCHIVE_DIR', default='statements')
+STATEMENT_SHARDS = config('STATEMENT_SHARDS', default=16, cast=int)
+
+# System wallet ids and currencies are cached per process (finance.registry) and
+# invalidated over Redis pub/sub; the TTL only matters if that channel is down.
+SYSTEM_REGISTRY_TTL = config('SYSTEM_REGISTRY_TTL', default=300, cast=int)
+
+# Withdrawal fees are served from a per-process compiled copy of FeeConfiguration;
+# each process checks the shared schedule version this often (admin saves bump it).
+FEE_SCHEDULE_CHECK_SECONDS = config('FEE_SCHEDULE_CHECK_SECONDS', default=5.0, cast=float)
+
+# Organizer commission split plans live in the cache (invalidated on UserAdmin save);
+# the TTL only bounds staleness if an invalidation is ever missed.
+COMMISSION_PLAN_TTL = config('COMMISSION_PLAN_TTL', default=3600, cast=int)
+
+# --- WEBHOOKS (Outbox -> Tickets Service) ---
+TICKETS_SERVICE_URL = config('TICKETS_SERVICE_URL', default='http://localhost:8000')
+WEBHOOK_SECRET = config('WEBHOOK_SECRET', default='')
+WEBHOOK_DISPATCH_INTERVAL = config('WEBHOOK_DISPATCH_INTERVAL', default=2.0, cast=float)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=int)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=10, cast=int)
+WEBHOOK_RETRY_BASE_SECONDS = config('WEBHOOK_RETRY_BASE_SECONDS', default=5, cast=int)
+WEBHOOK_RETRY_MAX_SECONDS = config('WEBHOOK_RETRY_MAX_SECONDS', default=3600, cast=int)
+WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT = config('WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT', default=4, cast=int)
+# Coalescing: pending events for one endpoint are packed into a single signed POST
+# of up to WEBHOOK_BATCH_MAX_EVENTS, held back up to WEBHOOK_BATCH_LINGER_SECONDS to fill.
+WEBHOOK_BATCH_MAX_EVENTS = config('WEBHOOK_BATCH_MAX_EVENTS', default=500, cast=int)
+WEBHOOK_BATCH_LINGER_SECONDS = config('WEBHOOK_BATCH_LINGER_SECONDS', default=1.0, cast=float)
+
+# --- NOTIFICATION QUEUE & DIGESTS ---
+# Wallets with credit_alerts set to a digest get one summary every
+# NOTIFY_DIGEST_INTERVAL_MINUTES or NOTIFY_DIGEST_MAX_EVENTS credits, whichever comes first.
+NOTIFY_DIGEST_INTERVAL_MINUTES = config('NOTIFY_DIGEST_INTERVAL_MINUTES', default=15, cast=int)
+NOTIFY_DIGEST_MAX_EVENTS = config('NOTIFY_DIGEST_MAX_EVENTS', default=50, cast=int)
+
+# Ledger notifications are queued in Redis and sent as provider bulk calls
+# (up to NOTIFY_BATCH_DRAIN_SIZE per drain) every NOTIFY_BATCH_INTERVAL seconds.
+NOTIFY_BATCH_INTERVAL = config('NOTIFY_BATCH_INTERVAL', default=1.0, cast=float)
+NOTIFY_BATCH_DRAIN_SIZE = config('NOTIFY_BATCH_DRAIN_SIZE', default=2000, cast=int)
+# A drained batch not acknowledged within this many seconds (worker died) goes back on the queue
+NOTIFY_PROCESSING_LEASE = config('NOTIFY_PROCESSING_LEASE', default=300, cast=int)
+
 # --- CELERY ---
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -143,13 +241,59 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Nairobi' 
+CELERY_BEAT_SCHEDULE = {
+    'rollup-system-journal': {
+        'task': 'finance.tasks.rollup_system_journal_task',
+        'schedule': LEDGER_ROLLUP_INTERVAL,
+    },
+    'dispatch-webhooks': {
+        'task': 'integrations.tasks.dispatch_webhooks_task',
+        'schedule': WEBHOOK_DISPATCH_INTERVAL,
+    },
+    'drain-notification-queue': {
+        'task': 'integrations.tasks.drain_notification_queue_task',
+        'schedule': NOTIFY_BATCH_INTERVAL,
+    },
+    'flush-notification-digests': {
+        'task': 'integrations.tasks.flush_digests_task',
+        'schedule': 60.0,
+    },
+    'build-balance-checkpoints': {
+        'task': 'finance.tasks.build_balance_checkpoints_task',
+        'schedule': 3600.0,
+    },
+    'generate-monthly-statements': {
+        # Midday on the 1st (CELERY_TIMEZONE), when last month has ended in TIME_ZONE too
+        'task': 'finance.tasks.generate_monthly_statements_task',
+        'schedule': crontab(minute=0, hour=12, day_of_month=1),
+    },
+}
 
 # --- NOTIFICATIONS ---
 SMS_PROVIDER = config('SMS_PROVIDER', default='MOCK') 
+# Failover order. The router skips providers whose circuit is open and moves
+# ones slower than SMS_ROUTER_LATENCY_BUDGET_MS (p95) to the back.
+SMS_PROVIDERS = config('SMS_PROVIDERS', default=SMS_PROVIDER, cast=Csv())
+SMS_ROUTER_WINDOW = config('SMS_ROUTER_WINDOW', default=50, cast=int)               # recent calls per provider
+SMS_ROUTER_MIN_CALLS = config('SMS_ROUTER_MIN_CALLS', default=10, cast=int)
+SMS_ROUTER_ERROR_THRESHOLD = config('SMS_ROUTER_ERROR_THRESHOLD', default=0.5, cast=float)
+SMS_ROUTER_SLOW_CALL_MS = config('SMS_ROUTER_SLOW_CALL_MS', default=5000, cast=int)  # slower = counts as an error
+SMS_ROUTER_LATENCY_BUDGET_MS = config('SMS_ROUTER_LATENCY_BUDGET_MS', default=2000, cast=int)
+SMS_ROUTER_COOLDOWN_SECONDS = config('SMS_ROUTER_COOLDOWN_SECONDS', default=30, cast=int)
 MOBITECH_API_KEY = config('MOBITECH_API_KEY', default='')
 MOBITECH_SENDER_ID = config('MOBITECH_SENDER_ID', default='23107')
 BREVO_API_KEY = config('BREVO_API_KEY', default='')
 
+# Provider client layer: requests in flight per worker process, and per-provider
+# rate limits in requests/second (enforced per worker process).
+NOTIFY_MAX_IN_FLIGHT = config('NOTIFY_MAX_IN_FLIGHT', default=16, cast=int)
+NOTIFY_PROVIDER_TIMEOUT = config('NOTIFY_PROVIDER_TIMEOUT', default=10, cast=int)
+NOTIFY_RATE_LIMITS = {
+    'MOBITECH': config('MOBITECH_RATE_LIMIT', default=20, cast=float),
+    'AFRICASTALKING': config('AFRICASTALKING_RATE_LIMIT', default=10, cast=float),
+    'BREVO': config('BREVO_RATE_LIMIT', default=10, cast=float),
+}
+
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5174')
 
 # --- PROD SECURITY ---
@@ -2,7 +2,9 @@ from django.contrib import admin
 from django import forms
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from .models import Wallet, Transaction, LedgerEntry, FeeConfiguration
+from .models import Wallet, Transaction, LedgerEntry, FeeConfiguration, Currency, WalletBalanceCheckpoint
+from .services import FeeService, FeeSchedule, FeeScheduleError
+from . import registry
 from django.utils import timezone
 from datetime import timedelta
 
@@ -27,7 +29,8 @@ def withdraw_revenue_action(modeladmin, request, queryset):
             phone = form.cleaned_data['phone_number']
             wallet = queryset.first() 
 
-            if wallet.balance < amount:
+            # Revenue is sharded: check against the summed balance
+            if Wallet.objects.system_balance(Wallet.Type.REVENUE) < amount:
                 messages.error(request, "Insufficient Revenue Balance.")
                 return
 
@@ -65,11 +68,38 @@ def freeze_transactions(modeladmin, request, queryset):
 # --- 3. MODEL REGISTRATIONS ---
 
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ['label', 'wallet_type', 'balance', 'owner', 'currency']
-    list_filter = ['wallet_type', 'is_frozen']
+    list_display = ['label', 'wallet_type', 'shard', 'balance', 'total_balance', 'owner', 'currency']
+    list_filter = ['wallet_type', 'is_frozen', 'credit_alerts']
     search_fields = ['owner__username', 'owner__email', 'label']
     actions = [withdraw_revenue_action]
 
+    def total_balance(self, obj):
+        # Sharded system wallets: show the logical balance across all shards
+        if obj.owner_id is None and obj.wallet_type in Wallet.SHARDED_TYPES:
+            return Wallet.objects.system_balance(obj.wallet_type)
+        return obj.balance
+    total_balance.short_description = "Total (All Shards)"
+
+    # System wallets are cached per process (finance.registry): changes must reach every node
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.owner_id is None:
+            registry.invalidate()
+        # History is read by entry owner: a re-assigned wallet takes its entries along
+        if change and 'owner' in form.changed_data:
+            LedgerEntry.objects.filter(wallet=obj).update(owner_id=obj.owner_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        if obj.owner_id is None:
+            registry.invalidate()
+
+    def delete_queryset(self, request, queryset):
+        system = queryset.filter(owner__isnull=True).exists()
+        super().delete_queryset(request, queryset)
+        if system:
+            registry.invalidate()
+
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['reference', 'transaction_type', 'status', 'amount_display', 'created_at']
     list_filter = ['status', 'transaction_type', 'created_at']
@@ -80,11 +110,79 @@ class TransactionAdmin(admin.ModelAdmin):
         entry = obj.entries.filter(entry_type='DEBIT').first()
         return entry.amount if entry else 0
 
+class FeeConfigForm(forms.ModelForm):
+    class Meta:
+        model = FeeConfiguration
+        fields = '__all__'
+
+    def clean(self):
+        cleaned = super().clean()
+        if self.errors:
+            return cleaned
+
+        # Compile the schedule as it would be after this save: overlaps are rejected here
+        bands = list(
+            FeeConfiguration.objects.exclude(pk=self.instance.pk)
+            .values('min_amount', 'max_amount', 'service_fee', 'network_fee')
+        )
+        bands.append({key: cleaned[key] for key in ('min_amount', 'max_amount', 'service_fee', 'network_fee')})
+        try:
+            self.schedule = FeeSchedule(bands, strict=True)
+        except FeeScheduleError as e:
+            raise forms.ValidationError(str(e))
+        return cleaned
+
+
 @admin.register(FeeConfiguration)
 class FeeConfigAdmin(admin.ModelAdmin):
+    form = FeeConfigForm
     list_display = ['min_amount', 'max_amount', 'service_fee', 'network_fee']
     list_editable = ['service_fee', 'network_fee']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        FeeService.invalidate()
+        for low, high in getattr(form, 'schedule', FeeSchedule([])).gaps:
+            messages.warning(request, f"No fee band covers KES {low}-{high}: withdrawals in that range are free.")
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        FeeService.invalidate()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        FeeService.invalidate()
+
+@admin.register(Currency)
+class CurrencyAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'symbol']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        registry.invalidate()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        registry.invalidate()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        registry.invalidate()
+
+@admin.register(WalletBalanceCheckpoint)
+class WalletBalanceCheckpointAdmin(admin.ModelAdmin):
+    # Written by the checkpoint job only (BalanceService.build_checkpoints)
+    list_display = ['wallet', 'period_end', 'balance', 'debit_total', 'credit_total', 'entry_count']
+    list_select_related = ['wallet']
+    search_fields = ['wallet__label', 'wallet__owner__email']
+    date_hierarchy = 'period_end'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(Wallet, WalletAdmin)
 admin.site.register(LedgerEntry)
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Ledger history rows for the finance and service history endpoints.
+
+Entries are read as .values() tuples of just the returned columns (one join,
+no model instances) and turned into the API's dicts in a single pass.
+"""
+from .models import LedgerEntry
+
+# Response key -> column. 'id' is the transaction id (what the clients show and link to).
+FIELDS = {
+    'id': 'transaction_id',
+    'type': 'transaction__transaction_type',
+    'status': 'transaction__status',
+    'reference': 'transaction__reference',
+    'description': 'transaction__description',
+    'wallet_label': 'wallet__label',
+}
+USER_FIELDS = ('id', 'type', 'status', 'reference', 'description', 'wallet_label')
+SERVICE_FIELDS = ('id', 'type', 'status', 'reference')
+
+# Always selected: the signed amount and date, plus the keyset columns (finance.pagination)
+BASE_COLUMNS = ('id', 'created_at', 'amount', 'entry_type')
+
+
+def project(queryset, fields):
+    """Restricts a LedgerEntry queryset to the columns needed for 'fields' (dict rows)."""
+    return queryset.values(*BASE_COLUMNS, *(FIELDS[name] for name in fields))
+
+
+def serialize(rows, fields):
+    """
+    Projected rows -> history items, in response key order:
+    id, type, amount (signed Decimal), status, reference, [description], date, [wallet_label].
+    """
+    debit = LedgerEntry.EntryType.DEBIT
+    show_description = 'description' in fields
+    show_label = 'wallet_label' in fields
+
+    history = []
+    for row in rows:
+        amount = row['amount']
+        item = {
+            "id": row['transaction_id'],
+            "type": row['transaction__transaction_type'],
+            "amount": -amount if row['entry_type'] == debit else amount,
+            "status": row['transaction__status'],
+            "reference": row['transaction__reference'],
+        }
+        if show_description:
+            item["description"] = row['transaction__description']
+        # Same text as strftime("%Y-%m-%d %H:%M"), without the per-row format parsing
+        item["date"] = row['created_at'].isoformat(' ')[:16]
+        if show_label:
+            item["wallet_label"] = row['wallet__label']
+        history.append(item)
+    return history
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from finance.models import Wallet, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = 'Copies wallet.owner onto LedgerEntry rows still missing it (migration 0012 does this once; safe to re-run).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Entries updated per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = reported = 0
+
+        # Per wallet, so each batch is a range of the (wallet, created_at, id) index
+        # and system-wallet entries (which stay owner-less) are never rescanned
+        owned = Wallet.objects.filter(owner__isnull=False).values_list('id', 'owner_id').order_by('id')
+        for wallet_id, owner_id in owned.iterator():
+            while True:
+                with transaction.atomic():
+                    ids = list(
+                        LedgerEntry.objects.filter(wallet_id=wallet_id, owner__isnull=True)
+                        .values_list('id', flat=True)[:batch_size]
+                    )
+                    if not ids:
+                        break
+                    total += LedgerEntry.objects.filter(id__in=ids).update(owner_id=owner_id)
+
+            if total - reported >= batch_size * 10:
+                reported = total
+                self.stdout.write(f"  ...{total} entries so far")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Backfilled owner on {total} ledger entries."))
@@ -0,0 +1,91 @@
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from finance.models import Wallet, Currency, LedgerEntry, Transaction
+from finance import history
+
+
+def serialize_models(entries):
+    """The history serializer before finance.history: full instances via select_related."""
+    rows = []
+    for entry in entries:
+        tx = entry.transaction
+        sign = -1 if entry.entry_type == LedgerEntry.EntryType.DEBIT else 1
+        rows.append({
+            "id": str(tx.id),
+            "type": tx.transaction_type,
+            "amount": float(entry.amount) * sign,
+            "status": tx.status,
+            "reference": tx.reference,
+            "description": tx.description,
+            "date": entry.created_at.strftime("%Y-%m-%d %H:%M"),
+            "wallet_label": entry.wallet.label
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks one large history page: model instances (before) vs .values() projection (after).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Entries on the page')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (best one is reported)')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:6].upper()
+        total = options['rows']
+
+        kes, _ = Currency.objects.get_or_create(code='KES', defaults={'name': 'Kenyan Shilling', 'symbol': 'KSh'})
+        wallet = Wallet.objects.create(currency=kes, wallet_type=Wallet.Type.CUSTOMER, label=f"BENCH {run_id} history")
+
+        txs = [
+            Transaction(reference=f"BENCH-{run_id}-{n}", description="History benchmark", transaction_type=Transaction.Type.TRANSFER)
+            for n in range(total)
+        ]
+        Transaction.objects.bulk_create(txs, batch_size=2000)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                transaction=tx, wallet=wallet, amount=Decimal(n % 5000) + Decimal('0.25'),
+                entry_type=LedgerEntry.EntryType.DEBIT if n % 3 == 0 else LedgerEntry.EntryType.CREDIT
+            )
+            for n, tx in enumerate(txs)
+        ], batch_size=2000)
+
+        entries = LedgerEntry.objects.filter(wallet=wallet).order_by('-created_at', '-id')
+        variants = [
+            ("before", lambda: serialize_models(entries.select_related('transaction', 'wallet')[:total])),
+            ("after", lambda: history.serialize(history.project(entries, history.USER_FIELDS)[:total], history.USER_FIELDS)),
+        ]
+
+        try:
+            for name, run in variants:
+                self.measure(name, run, options['repeat'])
+        finally:
+            if not options['keep']:
+                self.cleanup(run_id, wallet)
+
+    def measure(self, name, run, repeat):
+        best, peak, count = None, 0, 0
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.perf_counter()
+            count = len(run())
+            elapsed = time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            best = elapsed if best is None else min(best, elapsed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{name:<7} {count} rows in {best * 1000:.0f}ms → {count / best:,.0f} rows/s | "
+            f"peak memory {peak / 1024 / 1024:.1f} MiB"
+        ))
+
+    def cleanup(self, run_id, wallet):
+        LedgerEntry.objects.filter(wallet=wallet).delete()
+        Transaction.objects.filter(reference__startswith=f"BENCH-{run_id}-").delete()
+        wallet.delete()
+        self.stdout.write(f"Cleaned up benchmark run {run_id}.")
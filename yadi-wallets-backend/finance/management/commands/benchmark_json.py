@@ -0,0 +1,78 @@
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from config.renderers import ORJSONRenderer
+from finance.models import LedgerEntry, Transaction, Wallet
+from finance import history
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmarks DRF JSONRenderer vs ORJSONRenderer on /history/ and /wallets/ shaped payloads (no DB).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Entries on the history page')
+        parser.add_argument('--wallets', type=int, default=8, help='Wallets in the wallet list')
+        parser.add_argument('--iterations', type=int, default=2000, help='Renders per payload and renderer')
+
+    def handle(self, *args, **options):
+        payloads = {
+            'history': self.history_payload(options['rows']),
+            'wallets': self.wallets_payload(options['wallets']),
+        }
+        renderers = [('drf', JSONRenderer()), ('orjson', ORJSONRenderer())]
+
+        for name, payload in payloads.items():
+            timings = {}
+            for label, renderer in renderers:
+                size = len(renderer.render(payload))
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    renderer.render(payload)
+                timings[label] = (time.perf_counter() - started) / options['iterations']
+                self.stdout.write(
+                    f"{name:<8} {label:<7} {timings[label] * 1e6:8.1f}µs/render | {size:,} bytes"
+                )
+            self.stdout.write(self.style.SUCCESS(f"{name:<8} speedup ×{timings['drf'] / timings['orjson']:.1f}"))
+
+    def history_payload(self, count):
+        """Same shape as TransactionHistoryView's response (rows as finance.history projects them)."""
+        now = timezone.now()
+        rows = [{
+            'id': uuid.uuid4(),
+            'created_at': now - timedelta(minutes=n),
+            'amount': Decimal(n * 37 % 50000) + Decimal('0.50'),
+            'entry_type': LedgerEntry.EntryType.DEBIT if n % 3 == 0 else LedgerEntry.EntryType.CREDIT,
+            'transaction_id': uuid.uuid4(),
+            'transaction__transaction_type': Transaction.Type.TRANSFER,
+            'transaction__status': Transaction.Status.COMPLETED,
+            'transaction__reference': f"TRF-INST-{n:08X}",
+            'transaction__description': f"Internal: Savings -> Goal {n % 5}",
+            'wallet__label': "Main Wallet",
+        } for n in range(count)]
+        return {
+            'next': "https://api.example.com/api/finance/history/?cursor=...",
+            'next_cursor': "...",
+            'results': history.serialize(rows, history.USER_FIELDS),
+        }
+
+    def wallets_payload(self, count):
+        """Same shape as WalletManagementView.get."""
+        def wallet(n, wallet_type):
+            return {
+                "id": str(uuid.uuid4()),
+                "label": f"Wallet {n}",
+                "balance": Decimal(n * 104729 % 1000000) + Decimal('0.75'),
+                "currency": "KES",
+                "is_primary": n == 0,
+                "is_frozen": False,
+                "credit_alerts": Wallet.CreditAlerts.INSTANT,
+            }
+        return {
+            "business_wallets": [wallet(n, Wallet.Type.ORGANIZER) for n in range(count // 2)],
+            "personal_wallets": [wallet(n, Wallet.Type.CUSTOMER) for n in range(count - count // 2)],
+        }
@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, OperationalError
+from finance.models import Wallet, Currency, LedgerEntry, Transaction
+from finance.services import LedgerService, PostingMode, InsufficientFundsError
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks LOCKED (select_for_update) vs ATOMIC (UPDATE ... RETURNING) posting on hot wallets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['LOCKED', 'ATOMIC', 'both'], default='both')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent posting workers')
+        parser.add_argument('--transactions', type=int, default=500, help='Postings per mode')
+        parser.add_argument('--sources', type=int, default=50, help='Funded user wallets to debit')
+        parser.add_argument('--hot-wallets', type=int, default=1, help='Shared wallets every posting credits')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "⚠️  SQLite serializes all writers. Run this against Postgres for meaningful numbers."
+            ))
+
+        modes = [PostingMode.LOCKED, PostingMode.ATOMIC] if options['mode'] == 'both' else [options['mode']]
+        run_id = uuid.uuid4().hex[:6].upper()
+
+        kes, _ = Currency.objects.get_or_create(code='KES', defaults={'name': 'Kenyan Shilling', 'symbol': 'KSh'})
+
+        # Owner-less user wallets: the debit guard applies, no notifications are queued
+        sources = [
+            Wallet(currency=kes, wallet_type=Wallet.Type.CUSTOMER, label=f"BENCH {run_id} src {i}", balance=Decimal('1000000.00'))
+            for i in range(options['sources'])
+        ]
+        hot = [
+            Wallet(currency=kes, wallet_type=Wallet.Type.ORGANIZER, label=f"BENCH {run_id} hot {i}")
+            for i in range(options['hot_wallets'])
+        ]
+        Wallet.objects.bulk_create(sources + hot)
+
+        try:
+            for mode in modes:
+                self.run_mode(mode, run_id, sources, hot, options)
+        finally:
+            if not options['keep']:
+                self.cleanup(run_id, sources + hot)
+
+    def run_mode(self, mode, run_id, sources, hot, options):
+        total = options['transactions']
+        counter = iter(range(total))
+        lock = threading.Lock()
+        latencies = []
+        errors = {'insufficient': 0, 'db': 0}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        n = next(counter, None)
+                    if n is None:
+                        return
+
+                    amount = Decimal(random.randint(100, 5000)) / 100
+                    entries = [
+                        {'wallet': random.choice(sources), 'amount': amount, 'type': LedgerEntry.EntryType.DEBIT},
+                        {'wallet': random.choice(hot), 'amount': amount, 'type': LedgerEntry.EntryType.CREDIT},
+                    ]
+
+                    started = time.perf_counter()
+                    try:
+                        LedgerService.process_transaction(
+                            reference=f"BENCH-{run_id}-{mode}-{n}",
+                            description="Posting benchmark",
+                            tx_type=Transaction.Type.TRANSFER,
+                            entries=entries,
+                            mode=mode
+                        )
+                    except InsufficientFundsError:
+                        errors['insufficient'] += 1
+                    except OperationalError:
+                        errors['db'] += 1
+                    elapsed = time.perf_counter() - started
+
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{mode:<7} {len(latencies)} postings in {wall:.2f}s "
+            f"→ {len(latencies) / wall:,.0f} tx/s | p50 {p50:.1f}ms | p95 {p95:.1f}ms | "
+            f"rejected {errors['insufficient']} | db errors {errors['db']}"
+        ))
+
+    def cleanup(self, run_id, wallets):
+        LedgerEntry.objects.filter(transaction__reference__startswith=f"BENCH-{run_id}-").delete()
+        Transaction.objects.filter(reference__startswith=f"BENCH-{run_id}-").delete()
+        Wallet.objects.filter(id__in=[w.id for w in wallets]).delete()
+        self.stdout.write(f"Cleaned up benchmark run {run_id}.")
@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from finance import statement_runs
+from finance.statements import StatementError
+
+
+class Command(BaseCommand):
+    help = 'Writes month-end statements for every ORGANIZER wallet (resumable; see finance.statement_runs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='YYYY-MM (default: last month)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--shards', type=int, help='Wallet shards (default: 4 per worker, for even load)')
+        parser.add_argument('--force', action='store_true', help='Re-render statements that already exist')
+
+    def handle(self, *args, **options):
+        try:
+            label, _, _ = statement_runs.month_period(options['month'])
+        except StatementError as e:
+            raise CommandError(str(e))
+
+        workers = max(options['workers'], 1)
+        shards = statement_runs.plan(label, options['shards'] or workers * 4, force=options['force'])
+        pending = sum(len(shard) for shard in shards)
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f"✅ All {label} statements already written."))
+            return
+        self.stdout.write(f"📄 {label}: {pending} statements in {len(shards)} shards on {workers} workers...")
+
+        # Children must open their own DB connections, not share the parent's sockets
+        connections.close_all()
+        started = time.monotonic()
+        wallets = entries = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(statement_runs.render_shard, label, shard) for shard in shards]
+            for future in as_completed(futures):
+                result = future.result()
+                wallets += result['wallets']
+                entries += result['entries']
+                self.stdout.write(f"  ...{wallets}/{pending} wallets")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {label}: {wallets} statements, {entries} entries in {elapsed:.1f}s "
+            f"→ {wallets / elapsed * 60:,.0f} wallets/min"
+        ))
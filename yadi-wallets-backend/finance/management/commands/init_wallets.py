@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from finance.models import Wallet, Currency
+from finance import registry
 
 class Command(BaseCommand):
     help = 'Initializes the System Wallets (Liquidity, Revenue, Settlement, etc.)'
@@ -13,25 +15,34 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(self.style.SUCCESS(f"Created Currency: {kes}"))
 
-        # Helper to create system wallet
+        # Helper to create system wallet (one row per shard for the hot ones)
         def create_system_wallet(w_type, label):
-            wallet, created = Wallet.objects.get_or_create(
-                wallet_type=w_type,
-                currency=kes,
-                defaults={
-                    'owner': None, # System owned
-                    'balance': 0.00,
-                    'label': label
-                }
-            )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f"✅ Created {label} ({w_type})"))
-            else:
-                self.stdout.write(self.style.WARNING(f"⚠️  Exists: {label}"))
+            shard_count = max(settings.SYSTEM_WALLET_SHARDS, 1) if w_type in Wallet.SHARDED_TYPES else 1
+
+            for shard in range(shard_count):
+                shard_label = label if shard == 0 else f"{label} #{shard}"
+                wallet, created = Wallet.objects.get_or_create(
+                    wallet_type=w_type,
+                    owner=None, # System owned
+                    shard=shard,
+                    defaults={
+                        'currency': kes,
+                        'balance': 0.00,
+                        'label': shard_label
+                    }
+                )
+                if created:
+                    self.stdout.write(self.style.SUCCESS(f"✅ Created {shard_label} ({w_type})"))
+                else:
+                    self.stdout.write(self.style.WARNING(f"⚠️  Exists: {shard_label}"))
 
         # 2. Create the Fleet
         create_system_wallet(Wallet.Type.MASTER_LIQUIDITY, "Master Liquidity (Paybill)")
         create_system_wallet(Wallet.Type.SETTLEMENT, "Settlement (Incoming)")
         create_system_wallet(Wallet.Type.REVENUE, "Yadi Revenue (Profit)")
         create_system_wallet(Wallet.Type.SUSPENSE, "Suspense (Payout Lock)")
-        create_system_wallet(Wallet.Type.RESERVE, "Reserve (Bank Vault)")
\ No newline at end of file
+        create_system_wallet(Wallet.Type.RESERVE, "Reserve (Bank Vault)")
+
+        # 3. Tell every running process to reload its system wallet registry
+        registry.invalidate()
+        self.stdout.write("🔄 System wallet registry invalidated.")
@@ -23,12 +23,18 @@ class Command(BaseCommand):
 
         self.stdout.write(f"Found {due_txs.count()} payouts due for release.")
 
-        suspense_wallet = Wallet.objects.get(wallet_type=Wallet.Type.SUSPENSE)
-        master_wallet = Wallet.objects.get(wallet_type=Wallet.Type.MASTER_LIQUIDITY)
-
         for tx in due_txs:
             try:
                 with transaction.atomic():
+                    # Same shards the original request was routed to. The registry only hands
+                    # out unsaved stand-ins (ids): lock and re-read the real rows, in pk order.
+                    shard_ids = [
+                        Wallet.objects.system_wallet(Wallet.Type.SUSPENSE, tx.reference).id,
+                        Wallet.objects.system_wallet(Wallet.Type.MASTER_LIQUIDITY, tx.reference).id,
+                    ]
+                    wallets = {wallet.id: wallet for wallet in Wallet.objects.select_for_update().filter(id__in=shard_ids).order_by('pk')}
+                    suspense_wallet, master_wallet = wallets[shard_ids[0]], wallets[shard_ids[1]]
+
                     # Get the amount from the original DEBIT entry
                     # (We moved it to Suspense earlier, now we move it OUT of Suspense)
                     original_entry = tx.entries.filter(entry_type=LedgerEntry.EntryType.DEBIT).first()
@@ -38,7 +44,7 @@ class Command(BaseCommand):
                     # In a real app, we might do this *outside* the atomic block 
                     # or handle the 'Pending' state of M-Pesa B2C. 
                     # For now, we assume instant success/fail for simplicity.
-                    user_phone = tx.entries.first().wallet.owner.phone_number
+                    user_phone = original_entry.wallet.owner.phone_number # The customer's leg (entries have no order)
                     mpesa_ref = MpesaGateway.trigger_b2c(user_phone, amount, tx.reference)
 
                     # 3. Update Ledger (Clear the Liability)
@@ -53,6 +59,7 @@ class Command(BaseCommand):
                     LedgerEntry.objects.create(
                         transaction=tx,
                         wallet=suspense_wallet,
+                        owner_id=suspense_wallet.owner_id,
                         amount=amount,
                         entry_type=LedgerEntry.EntryType.DEBIT, # Remove from Suspense
                         balance_after=suspense_wallet.balance - amount
@@ -63,6 +70,7 @@ class Command(BaseCommand):
                     LedgerEntry.objects.create(
                         transaction=tx,
                         wallet=master_wallet,
+                        owner_id=master_wallet.owner_id,
                         amount=amount,
                         entry_type=LedgerEntry.EntryType.CREDIT, # Return to Master (money gone)
                         balance_after=master_wallet.balance + amount
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from users.models import User
 from finance.models import Wallet, LedgerEntry, Transaction
-from django.db import transaction
+from finance.services import LedgerService
 from decimal import Decimal
 import uuid
 
@@ -22,45 +22,25 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"User {email} not found"))
             return
 
-        # Ensure MASTER_LIQUIDITY exists
-        master_wallet, _ = Wallet.objects.get_or_create(wallet_type=Wallet.Type.MASTER_LIQUIDITY, defaults={'balance': 0})
+        ref = f"SIM-{uuid.uuid4().hex[:8].upper()}"
+
+        # MASTER_LIQUIDITY must exist (run init_wallets first)
+        master_wallet = Wallet.objects.system_wallet(Wallet.Type.MASTER_LIQUIDITY, ref)
 
         # Ensure user's personal wallet exists
         user_wallet, _ = Wallet.objects.get_or_create(owner=user, wallet_type=Wallet.Type.CUSTOMER, defaults={'balance': 0})
 
-        with transaction.atomic():
-            ref = f"SIM-{uuid.uuid4().hex[:8].upper()}"
-
-            # Update balances
-            master_wallet.balance += amount
-            master_wallet.save()
-
-            user_wallet.balance += amount
-            user_wallet.save()
-
-            # Create Transaction
-            tx = Transaction.objects.create(
-                reference=ref,
-                transaction_type=Transaction.Type.DEPOSIT,
-                description="Simulated Personal Wallet Deposit",
-                status=Transaction.Status.COMPLETED
-            )
-
-            # Ledger entries
-            LedgerEntry.objects.create(
-                transaction=tx,
-                wallet=master_wallet,
-                amount=amount,
-                entry_type=LedgerEntry.EntryType.DEBIT,
-                balance_after=master_wallet.balance
-            )
-            LedgerEntry.objects.create(
-                transaction=tx,
-                wallet=user_wallet,
-                amount=amount,
-                entry_type=LedgerEntry.EntryType.CREDIT,
-                balance_after=user_wallet.balance
-            )
+        # Posted like a real deposit: locks the real rows, snapshots balances, sets entry owners
+        LedgerService.process_transaction(
+            reference=ref,
+            description="Simulated Personal Wallet Deposit",
+            tx_type=Transaction.Type.DEPOSIT,
+            entries=[
+                {'wallet': master_wallet, 'amount': amount, 'type': LedgerEntry.EntryType.DEBIT},
+                {'wallet': user_wallet, 'amount': amount, 'type': LedgerEntry.EntryType.CREDIT},
+            ],
+            status=Transaction.Status.COMPLETED
+        )
 
         self.stdout.write(self.style.SUCCESS(f"✅ Successfully deposited KES {amount} to {email}"))
         self.stdout.write(self.style.SUCCESS(f"   New Balance: KES {user_wallet.balance}"))
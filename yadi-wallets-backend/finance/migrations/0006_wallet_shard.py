@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_create_system_wallets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='wallet',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True), models.Q(('wallet_type__in', ['CUSTOMER', 'ORGANIZER']), _negated=True)), fields=('wallet_type', 'shard'), name='unique_system_wallet_shard'),
+        ),
+    ]
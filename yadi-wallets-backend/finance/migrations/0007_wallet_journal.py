@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_wallet_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletJournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('rolled_up_at', models.DateTimeField(blank=True, null=True)),
+                ('ledger_entry', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='journal_entry', to='finance.ledgerentry')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='journal', to='finance.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('rolled_up_at__isnull', True)), fields=['wallet'], name='journal_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0007_wallet_journal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='credit_alerts',
+            field=models.CharField(choices=[('INSTANT', 'SMS per Credit'), ('SMS_DIGEST', 'SMS Digest'), ('EMAIL_DIGEST', 'Email Digest')], default='INSTANT', max_length=15),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0008_wallet_credit_alerts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ledgerentry',
+            name='finance_led_wallet__68d207_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='finance_led_wallet__c71bb8_idx'),
+        ),
+    ]
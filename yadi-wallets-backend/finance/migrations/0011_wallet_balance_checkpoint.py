@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0010_ledgerentry_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateTimeField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('debit_total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('credit_total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('entry_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='checkpoints', to='finance.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period_end'], name='checkpoint_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'period_end'), name='checkpoint_wallet_period_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def backfill_entry_owners(apps, schema_editor):
+    """
+    Copies wallet.owner onto the ledger entries written before 0010, so the
+    owner-filtered history shows them. Per wallet and in batches (same as the
+    backfill_entry_owners command, which stays for re-runs).
+    """
+    Wallet = apps.get_model('finance', 'Wallet')
+    LedgerEntry = apps.get_model('finance', 'LedgerEntry')
+
+    owned = Wallet.objects.filter(owner__isnull=False).values_list('id', 'owner_id').order_by('id')
+    for wallet_id, owner_id in owned.iterator():
+        while True:
+            ids = list(
+                LedgerEntry.objects.filter(wallet_id=wallet_id, owner__isnull=True)
+                .values_list('id', flat=True)[:BATCH_SIZE]
+            )
+            if not ids:
+                break
+            LedgerEntry.objects.filter(id__in=ids).update(owner_id=owner_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0011_wallet_balance_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_entry_owners, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 import uuid
+import zlib
 from django.db import models
+from django.db.models import Q, Sum
 from django.conf import settings
 from decimal import Decimal
 
@@ -11,6 +13,49 @@ class Currency(models.Model):
     def __str__(self):
         return self.code
 
+class WalletManager(models.Manager):
+    """
+    Hot system wallets (MASTER, REVENUE, SUSPENSE) are split into shard rows so
+    concurrent postings don't all queue on one row lock. Callers go through
+    these helpers and never need to know how many shards exist.
+    """
+    def system_shards(self, wallet_type):
+        return self.filter(wallet_type=wallet_type, owner__isnull=True).order_by('shard')
+
+    def system_wallet(self, wallet_type, reference=None):
+        """
+        Returns the shard a posting should hit. Routing is a stable hash of the
+        transaction reference, so follow-up legs (e.g. a payout release) land on
+        the same shard as the original posting.
+        Served from the process-local registry: no query, the row is locked by id when posting.
+        """
+        from .registry import system_shards
+        shards = system_shards(wallet_type)
+        if not shards:
+            raise self.model.DoesNotExist(f"System wallet {wallet_type} not found. Run init_wallets.")
+        return self.pick_shard(shards, reference)
+
+    @staticmethod
+    def pick_shard(shards, reference=None):
+        """Routes a reference onto an already-loaded list of shards (no query)."""
+        if reference is None:
+            return shards[0]
+        return shards[zlib.crc32(str(reference).encode('utf-8')) % len(shards)]
+
+    def system_balance(self, wallet_type):
+        """
+        The logical, real-time balance of a system wallet: the sum of all its
+        shards (last rollup) plus any journal rows not yet rolled up.
+        """
+        total = self.system_shards(wallet_type).aggregate(total=Sum('balance'))['total']
+        pending = WalletJournalEntry.objects.filter(
+            wallet__wallet_type=wallet_type,
+            wallet__owner__isnull=True,
+            rolled_up_at__isnull=True
+        ).aggregate(total=Sum('delta'))['total']
+        return (total or Decimal('0.00')) + (pending or Decimal('0.00'))
+
+
 class Wallet(models.Model):
     class Type(models.TextChoices):
         # --- USER WALLETS ---
@@ -24,6 +69,17 @@ class Wallet(models.Model):
         SUSPENSE = 'SUSPENSE', 'Suspense (Held Funds)'           # Payout Lock
         RESERVE = 'RESERVE', 'Reserve (Bank Vault)'              # Safe Storage
 
+    class CreditAlerts(models.TextChoices):
+        INSTANT = 'INSTANT', 'SMS per Credit'
+        SMS_DIGEST = 'SMS_DIGEST', 'SMS Digest'        # High-volume organizers
+        EMAIL_DIGEST = 'EMAIL_DIGEST', 'Email Digest'
+
+    # Wallets holding customer money. These may never be overdrawn.
+    USER_TYPES = (Type.CUSTOMER, Type.ORGANIZER)
+
+    # System wallets hit by (almost) every posting. Split into shards by init_wallets.
+    SHARDED_TYPES = (Type.MASTER_LIQUIDITY, Type.REVENUE, Type.SUSPENSE)
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='wallets', null=True, blank=True)
     currency = models.ForeignKey(Currency, on_delete=models.PROTECT)
@@ -36,11 +92,30 @@ class Wallet(models.Model):
     # Denormalized Balance (For read speed only. Source of truth is Ledger)
     balance = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
     is_frozen = models.BooleanField(default=False)
+
+    # How the owner hears about incoming money. Debits always alert immediately.
+    credit_alerts = models.CharField(max_length=15, choices=CreditAlerts.choices, default=CreditAlerts.INSTANT)
+
+    # Shard number for system wallets (0 for everything else)
+    shard = models.PositiveSmallIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = WalletManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['wallet_type', 'shard'],
+                condition=Q(owner__isnull=True) & ~Q(wallet_type__in=['CUSTOMER', 'ORGANIZER']),
+                name='unique_system_wallet_shard'
+            ),
+        ]
+
     def __str__(self):
         owner_label = self.owner.username if self.owner else "SYSTEM"
+        if self.shard:
+            owner_label = f"{owner_label} #{self.shard}"
         return f"{self.get_wallet_type_display()} - {owner_label}"
     
 
@@ -120,6 +195,10 @@ class LedgerEntry(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, related_name='entries')
     wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='entries')
+    # Copy of wallet.owner (null for system wallets) so "all my wallets" history is one index range.
+    # Set by the posting engine; older rows are filled by `manage.py backfill_entry_owners`.
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True, blank=True,
+                              related_name='ledger_entries', db_index=False)
     
     amount = models.DecimalField(max_digits=20, decimal_places=2) # Always positive
     entry_type = models.CharField(max_length=10, choices=EntryType.choices)
@@ -131,5 +210,54 @@ class LedgerEntry(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['wallet', 'created_at']),
-        ]
\ No newline at end of file
+            # History pages seek on (created_at, id) within a wallet (finance.pagination)
+            models.Index(fields=['wallet', 'created_at', 'id']),
+            # ... and on (owner, created_at, id) across all of a user's wallets
+            models.Index(fields=['owner', 'created_at', 'id']),
+        ]
+
+
+class WalletBalanceCheckpoint(models.Model):
+    """
+    A wallet's closing balance at a period boundary (local midnight), with the
+    period's movements. Written only for periods the wallet had entries in, by
+    BalanceService.build_checkpoints; point-in-time balances start from the
+    nearest one (see BalanceService.balance_at).
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='checkpoints')
+    period_end = models.DateTimeField() # Covers entries with created_at < period_end
+
+    balance = models.DecimalField(max_digits=20, decimal_places=2)
+    debit_total = models.DecimalField(max_digits=20, decimal_places=2) # This period only
+    credit_total = models.DecimalField(max_digits=20, decimal_places=2)
+    entry_count = models.PositiveIntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'period_end'], name='checkpoint_wallet_period_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period_end'], name='checkpoint_period_idx'),
+        ]
+
+
+class WalletJournalEntry(models.Model):
+    """
+    Append-only queue of deferred system-wallet balance changes.
+    The LedgerEntry is written at posting time as usual; only the Wallet.balance
+    update waits for the rollup task to fold these rows in.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.PROTECT, related_name='journal')
+    ledger_entry = models.OneToOneField(LedgerEntry, on_delete=models.PROTECT, related_name='journal_entry')
+
+    delta = models.DecimalField(max_digits=20, decimal_places=2) # Signed: +credit / -debit
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    rolled_up_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet'], condition=Q(rolled_up_at__isnull=True), name='journal_pending_idx'),
+        ]
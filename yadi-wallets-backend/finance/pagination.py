@@ -0,0 +1,82 @@
+from datetime import datetime
+from uuid import UUID
+
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pages keyed on (created_at, id) instead of OFFSET.
+
+    Each page is one index range scan that starts right after the last row the
+    client saw (an opaque, signed cursor), so deep pages cost the same as the
+    first and rows inserted meanwhile never shift or repeat entries.
+    No COUNT(*) unless the client asks for it with ?count=true.
+
+    ?cursor=<next_cursor from the previous page>&page_size=20
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    salt = 'finance.pagination.keyset'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, entry):
+        # Model instances or .values() rows (see finance.history)
+        if isinstance(entry, dict):
+            created_at, entry_id = entry['created_at'], entry['id']
+        else:
+            created_at, entry_id = entry.created_at, entry.id
+        return signing.dumps([created_at.isoformat(), str(entry_id)], salt=self.salt, compress=True)
+
+    def decode_cursor(self, token):
+        try:
+            created_at, entry_id = signing.loads(token, salt=self.salt)
+            return datetime.fromisoformat(created_at), UUID(entry_id)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by('-created_at', '-id')
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            created_at, entry_id = self.decode_cursor(token)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=entry_id))
+
+        # One extra row tells us whether there is a next page
+        rows = list(queryset[:size + 1])
+        page = rows[:size]
+        self.next_cursor = self.encode_cursor(page[-1]) if len(rows) > size else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        body = {'next': self.get_next_link(), 'next_cursor': self.next_cursor}
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
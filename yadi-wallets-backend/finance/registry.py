@@ -0,0 +1,90 @@
+"""
+Process-local registry of system wallet shards and currencies.
+
+Both change only when `init_wallets` runs or an admin edits them, yet almost
+every money-moving request needs them. Each process loads them once (two
+queries) and serves them from memory; `invalidate()` publishes through
+integrations.pubsub so every gunicorn and Celery process drops its copy. If
+the listener cannot reach Redis, SYSTEM_REGISTRY_TTL bounds how stale a copy
+can get.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from integrations import pubsub
+from .models import Currency, Wallet
+
+TOPIC = "system_registry"
+
+_state = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def _load():
+    shards = {}
+    rows = (
+        Wallet.objects.filter(owner__isnull=True)
+        .exclude(wallet_type__in=Wallet.USER_TYPES)
+        .order_by('wallet_type', 'shard')
+        .values('id', 'wallet_type', 'shard', 'label', 'currency_id')
+    )
+    for row in rows:
+        shards.setdefault(row['wallet_type'], []).append(row)
+    currencies = {currency.code: currency for currency in Currency.objects.all()}
+    return {'shards': shards, 'currencies': currencies}
+
+
+def _get_state():
+    global _state, _loaded_at
+    pubsub.ensure_listener()
+    with _lock:
+        if _state is None or time.monotonic() - _loaded_at > settings.SYSTEM_REGISTRY_TTL:
+            _state = _load()
+            _loaded_at = time.monotonic()
+        return _state
+
+
+def clear():
+    """Drops this process's copy; the next lookup reloads it."""
+    global _state
+    with _lock:
+        _state = None
+
+
+def invalidate():
+    """Drops the copy in every process (this one immediately, others via pub/sub)."""
+    clear()
+    pubsub.publish(TOPIC)
+
+
+pubsub.subscribe(TOPIC, lambda message: clear())
+
+
+# --- LOOKUPS ---
+def system_shards(wallet_type):
+    """
+    Shard wallets of a system type, ordered by shard, as unsaved stand-ins that
+    carry the real ids (postings lock and update rows by id). Fresh instances
+    per call, so callers may mutate them.
+    """
+    rows = _get_state()['shards'].get(wallet_type)
+    if not rows:
+        # Maybe created moments ago on another node: reload once before giving up
+        clear()
+        rows = _get_state()['shards'].get(wallet_type, [])
+    return [Wallet(**row) for row in rows]
+
+
+def currency(code, defaults=None):
+    """Currency by code; created (and every process invalidated) if missing."""
+    found = _get_state()['currencies'].get(code)
+    if found is None:
+        found, created = Currency.objects.get_or_create(code=code, defaults=defaults or {})
+        if created:
+            invalidate()
+        else:
+            clear()
+    return found
@@ -1,60 +1,532 @@
-from django.db import transaction
-from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction, connection
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from datetime import datetime, timedelta
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+import threading
+import time
 import uuid
-from .models import Transaction, LedgerEntry, Wallet, FeeConfiguration
+from .models import Transaction, LedgerEntry, Wallet, WalletJournalEntry, WalletBalanceCheckpoint, FeeConfiguration
 # IMPORT CELERY TASKS
-from integrations.tasks import send_sms_task, send_email_task
+from integrations.tasks import send_email_task, publish_notifications
+
+logger = logging.getLogger(__name__)
+
+class InsufficientFundsError(ValueError):
+    """Raised when a guarded debit would take a user wallet below zero."""
+
+
+class PostingMode:
+    """
+    How LedgerService writes balances.
+    LOCKED: SELECT ... FOR UPDATE, adjust in Python, write back (default).
+    ATOMIC: one 'UPDATE ... RETURNING balance' per wallet. Debits on user wallets
+            carry a 'balance >= amount' guard, so the funds check cannot race.
+    """
+    LOCKED = 'LOCKED'
+    ATOMIC = 'ATOMIC'
+
+
+class FeeScheduleError(ValueError):
+    """The fee bands overlap or are malformed."""
+
+
+class FeeSchedule:
+    """
+    FeeConfiguration compiled into sorted bands, looked up with bisect.
+    strict=True raises FeeScheduleError on overlaps (admin validation); otherwise
+    an overlapping band is clipped to start after its predecessor, which matches
+    the old "lowest min_amount wins" query. Gaps are allowed (no fee) and listed in .gaps.
+    """
+    STEP = Decimal('0.01')
+
+    def __init__(self, bands, strict=False):
+        self.mins, self.maxs, self.fees = [], [], []
+        self.gaps = []
+
+        for band in sorted(bands, key=lambda b: (b['min_amount'], b['max_amount'])):
+            low, high = band['min_amount'], band['max_amount']
+            if low > high:
+                raise FeeScheduleError(f"Range {low}-{high}: min_amount is above max_amount.")
+
+            if self.maxs and low <= self.maxs[-1]:
+                message = f"Range {low}-{high} overlaps {self.mins[-1]}-{self.maxs[-1]}."
+                if strict:
+                    raise FeeScheduleError(message)
+                logger.error(f"Fee schedule: {message}")
+                low = self.maxs[-1] + self.STEP
+                if low > high:
+                    continue
+            elif self.maxs and low > self.maxs[-1] + self.STEP:
+                self.gaps.append((self.maxs[-1] + self.STEP, low - self.STEP))
+
+            self.mins.append(low)
+            self.maxs.append(high)
+            self.fees.append((band['service_fee'], band['network_fee']))
+
+    @classmethod
+    def from_db(cls, strict=False):
+        return cls(FeeConfiguration.objects.values('min_amount', 'max_amount', 'service_fee', 'network_fee'), strict=strict)
+
+    def lookup(self, amount):
+        """(service_fee, network_fee) for the band containing 'amount', zeros outside every band."""
+        i = bisect_right(self.mins, amount) - 1
+        if i >= 0 and amount <= self.maxs[i]:
+            return self.fees[i]
+        return Decimal('0.00'), Decimal('0.00')
+
 
 class FeeService:
+    # Compiled schedule for this process + the shared version it was built from
+    _schedule = None
+    _version = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    VERSION_KEY = "fees:schedule_version"
+
+    @staticmethod
+    def get_schedule():
+        """
+        The process-local FeeSchedule. Rebuilt (one query) when another process
+        bumped the shared version; the version is checked every FEE_SCHEDULE_CHECK_SECONDS.
+        """
+        now = time.monotonic()
+        with FeeService._lock:
+            if FeeService._schedule is not None and now - FeeService._checked_at < settings.FEE_SCHEDULE_CHECK_SECONDS:
+                return FeeService._schedule
+
+            try:
+                version = cache.get(FeeService.VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Fee schedule version unavailable, keeping local copy: {e}")
+                version = FeeService._version
+
+            if FeeService._schedule is None or version != FeeService._version:
+                FeeService._schedule = FeeSchedule.from_db()
+                FeeService._version = version
+            FeeService._checked_at = now
+            return FeeService._schedule
+
+    @staticmethod
+    def invalidate():
+        """Call after FeeConfiguration changes: every process rebuilds on its next check."""
+        with FeeService._lock:
+            FeeService._schedule = None
+        try:
+            cache.add(FeeService.VERSION_KEY, 0, timeout=None)
+            cache.incr(FeeService.VERSION_KEY)
+        except Exception as e:
+            logger.error(f"Fee schedule version not bumped, other processes refresh late: {e}")
+
     @staticmethod
     def calculate_withdrawal_fees(amount):
         amount_dec = Decimal(str(amount))
-        config = FeeConfiguration.objects.filter(
-            min_amount__lte=amount_dec,
-            max_amount__gte=amount_dec
-        ).first()
-        
-        if config:
-            return {
-                "service_fee": config.service_fee,
-                "network_fee": config.network_fee,
-                "total_deduction": amount_dec + config.service_fee + config.network_fee
-            }
-        
+        service_fee, network_fee = FeeService.get_schedule().lookup(amount_dec)
         return {
-            "service_fee": Decimal('0.00'),
-            "network_fee": Decimal('0.00'),
-            "total_deduction": amount_dec
+            "service_fee": service_fee,
+            "network_fee": network_fee,
+            "total_deduction": amount_dec + service_fee + network_fee
         }
 
-class LedgerService:
+class CommissionService:
+    """
+    Ticket-sale split plans, one per organizer, kept in the shared cache so the
+    payment path splits a sale without touching the users/wallets tables.
+
+    A plan is plain JSON:
+        {"format": 1, "organizer_id": "...", "net_wallet_id": "...",
+         "revenue_type": "REVENUE", "rounding": "ROUND_HALF_UP",
+         "tiers": [["0.00", "4.00"]]}
+    'tiers' are [min_sale_amount, percent] pairs, ascending; the last tier whose
+    minimum the sale reaches applies. Today every plan has the single tier from
+    User.commission_rate; volume tiers or promotional rates only need a richer
+    builder, not a new format.
+    """
+    KEY = "commission:plan:{}"
+    FORMAT = 1
+
+    @staticmethod
+    def build_plan(wallet):
+        """Plan for an organizer wallet (with its owner loaded)."""
+        return {
+            'format': CommissionService.FORMAT,
+            'organizer_id': str(wallet.owner.remote_ticket_user_id),
+            'net_wallet_id': str(wallet.id),
+            'revenue_type': Wallet.Type.REVENUE,
+            'rounding': ROUND_HALF_UP,
+            'tiers': [['0.00', str(wallet.owner.commission_rate)]],
+        }
+
+    @staticmethod
+    def get_plans(organizer_ids):
+        """
+        {organizer remote id (str): plan}. Cache hits cost no queries; all misses
+        are built from one query. Organizers without an organizer wallet are left out.
+        """
+        keys = {CommissionService.KEY.format(organizer_id): str(organizer_id) for organizer_id in organizer_ids}
+        plans = {}
+        try:
+            cached = cache.get_many(list(keys))
+        except Exception as e:
+            logger.warning(f"Commission plan cache unavailable: {e}")
+            cached = {}
+        for key, plan in cached.items():
+            if plan.get('format') == CommissionService.FORMAT:
+                plans[keys[key]] = plan
+
+        missing = [organizer_id for organizer_id in keys.values() if organizer_id not in plans]
+        if missing:
+            built = {}
+            for wallet in Wallet.objects.filter(
+                wallet_type=Wallet.Type.ORGANIZER, owner__remote_ticket_user_id__in=missing
+            ).select_related('owner'):
+                plan = CommissionService.build_plan(wallet)
+                plans[plan['organizer_id']] = plan
+                built[CommissionService.KEY.format(plan['organizer_id'])] = plan
+            if built:
+                try:
+                    cache.set_many(built, timeout=settings.COMMISSION_PLAN_TTL)
+                except Exception as e:
+                    logger.warning(f"Commission plans not cached: {e}")
+        return plans
+
+    @staticmethod
+    def get_plan(organizer_id):
+        plan = CommissionService.get_plans([organizer_id]).get(str(organizer_id))
+        if plan is None:
+            raise Wallet.DoesNotExist("Organizer wallet not found.")
+        return plan
+
+    @staticmethod
+    def invalidate(user):
+        """Call when an organizer's commission settings change."""
+        if user.remote_ticket_user_id:
+            cache.delete(CommissionService.KEY.format(user.remote_ticket_user_id))
+
+    @staticmethod
+    def split(plan, total_amount):
+        """(fee, net) for one sale. fee is rounded to cents; net gets the remainder, so they always add up."""
+        total_amount = Decimal(total_amount)
+        percent = Decimal(plan['tiers'][0][1])
+        for minimum, tier_percent in plan['tiers']:
+            if total_amount >= Decimal(minimum):
+                percent = Decimal(tier_percent)
+        fee = (total_amount * percent / 100).quantize(Decimal('0.01'), rounding=plan['rounding'])
+        return fee, total_amount - fee
+
+    @staticmethod
+    def net_wallet(plan):
+        """An unsaved stand-in for the organizer wallet: enough for posting (LOCKED mode reloads the row)."""
+        return Wallet(id=uuid.UUID(plan['net_wallet_id']), wallet_type=Wallet.Type.ORGANIZER)
+
+
+class BalanceService:
+    """
+    Point-in-time balances: the nearest WalletBalanceCheckpoint plus the entries
+    after it, instead of summing (or seeking through) a wallet's whole ledger.
+
+    Checkpoints close each local day a wallet had entries in, and are built in
+    day order by build_checkpoints (Celery beat). So no wallet has entries
+    between its own latest checkpoint and the newest checkpoint of any wallet:
+    the tail to scan is at most the time since the last build.
+    """
+
+    @staticmethod
+    def _signed(field='amount'):
+        return Case(When(entry_type=LedgerEntry.EntryType.DEBIT, then=-F(field)), default=F(field))
+
+    @staticmethod
+    def _day_start(day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    @staticmethod
+    def balance_at(wallet, moment):
+        """Balance from every entry created before 'moment' (two queries)."""
+        checkpoint = (
+            WalletBalanceCheckpoint.objects.filter(wallet=wallet, period_end__lte=moment)
+            .order_by('-period_end').values_list('period_end', 'balance').first()
+        )
+        tail = LedgerEntry.objects.filter(wallet=wallet, created_at__lt=moment)
+        balance = Decimal('0.00')
+        if checkpoint:
+            since, balance = checkpoint
+            tail = tail.filter(created_at__gte=since)
+        return balance + (tail.aggregate(total=Sum(BalanceService._signed()))['total'] or Decimal('0.00'))
+
+    @staticmethod
+    def balances_at(wallet_ids, moment):
+        """{wallet_id: balance before 'moment'} for many wallets in three queries."""
+        latest = (
+            WalletBalanceCheckpoint.objects.filter(wallet=OuterRef('pk'), period_end__lte=moment)
+            .order_by('-period_end').values('balance')[:1]
+        )
+        balances = {
+            wallet_id: balance if balance is not None else Decimal('0.00')
+            for wallet_id, balance in Wallet.objects.filter(id__in=wallet_ids)
+            .annotate(checkpoint=Subquery(latest)).values_list('id', 'checkpoint')
+        }
+
+        # One tail for everyone: from the newest checkpoint boundary (see class docstring)
+        tail = LedgerEntry.objects.filter(wallet_id__in=wallet_ids, created_at__lt=moment)
+        since = WalletBalanceCheckpoint.objects.filter(period_end__lte=moment).aggregate(since=Max('period_end'))['since']
+        if since:
+            tail = tail.filter(created_at__gte=since)
+        for wallet_id, total in tail.values('wallet_id').annotate(total=Sum(BalanceService._signed())).values_list('wallet_id', 'total'):
+            balances[wallet_id] += total
+        return {wallet_id: balance.quantize(Decimal('0.01')) for wallet_id, balance in balances.items()}
+
+    @staticmethod
+    def build_checkpoints(until=None):
+        """
+        Checkpoints every day that closed (BALANCE_CHECKPOINT_LAG_MINUTES ago) since
+        the newest checkpoint, BALANCE_CHECKPOINT_BATCH_DAYS per query and transaction.
+        Incremental and safe to re-run. Returns the number of checkpoints written.
+        """
+        cutoff = min(until or timezone.now(), timezone.now() - timedelta(minutes=settings.BALANCE_CHECKPOINT_LAG_MINUTES))
+        last_day = timezone.localtime(cutoff).date() # Days before this one have closed
+
+        newest = WalletBalanceCheckpoint.objects.aggregate(newest=Max('period_end'))['newest']
+        if newest is None:
+            first = LedgerEntry.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if first is None:
+                return 0
+            day = timezone.localtime(first).date()
+        else:
+            day = timezone.localtime(newest).date()
+
+        written = 0
+        while day < last_day:
+            upto = min(day + timedelta(days=settings.BALANCE_CHECKPOINT_BATCH_DAYS), last_day)
+            written += BalanceService._checkpoint_days(day, upto)
+            day = upto
+
+        if written:
+            logger.info(f"Balance checkpoints: wrote {written} up to {last_day}")
+        return written
+
     @staticmethod
     @transaction.atomic
-    def process_transaction(reference, description, tx_type, entries, status=Transaction.Status.COMPLETED):
-        tx = Transaction.objects.create(
-            reference=reference,
-            transaction_type=tx_type,
-            description=description,
-            status=status
+    def _checkpoint_days(first_day, end_day):
+        """Checkpoints for the local days [first_day, end_day), one aggregate query."""
+        start, end = BalanceService._day_start(first_day), BalanceService._day_start(end_day)
+        debit = LedgerEntry.EntryType.DEBIT
+        movements = list(
+            LedgerEntry.objects.filter(created_at__gte=start, created_at__lt=end)
+            .annotate(day=TruncDate('created_at'))
+            .values('wallet_id', 'day')
+            .annotate(
+                debits=Sum(Case(When(entry_type=debit, then=F('amount')), default=Value(Decimal('0.00')))),
+                credits=Sum(Case(When(entry_type=debit, then=Value(Decimal('0.00'))), default=F('amount'))),
+                count=Count('id'),
+            )
+            .order_by('day')
         )
+        if not movements:
+            return 0
 
+        balances = BalanceService.balances_at({row['wallet_id'] for row in movements}, start)
+        checkpoints = []
+        for row in movements:
+            wallet_id = row['wallet_id']
+            balances[wallet_id] += row['credits'] - row['debits']
+            checkpoints.append(WalletBalanceCheckpoint(
+                wallet_id=wallet_id,
+                period_end=BalanceService._day_start(row['day'] + timedelta(days=1)),
+                balance=balances[wallet_id],
+                debit_total=row['debits'],
+                credit_total=row['credits'],
+                entry_count=row['count'],
+            ))
+        WalletBalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=2000, ignore_conflicts=True)
+        return len(checkpoints)
+
+
+class LedgerService:
+    @staticmethod
+    def _prepare_entries(entries):
+        """
+        Validates the legs and checks that the books balance BEFORE any row is locked.
+        Returns the cleaned legs (in caller order) and the net change per wallet.
+        """
+        legs = []
+        deltas = {}
         total_debit = Decimal('0.00')
         total_credit = Decimal('0.00')
 
         for entry in entries:
-            wallet = Wallet.objects.select_for_update().get(id=entry['wallet'].id)
+            wallet = entry['wallet']
             amount = Decimal(str(entry['amount']))
             entry_type = entry['type']
 
+            if amount < 0:
+                raise ValueError(f"Ledger amounts must be positive. Got {amount} for {wallet}")
+
             if entry_type == LedgerEntry.EntryType.DEBIT:
                 total_debit += amount
-                wallet.balance -= amount
+                delta = -amount
+            elif entry_type == LedgerEntry.EntryType.CREDIT:
+                total_credit += amount
+                delta = amount
+            else:
+                raise ValueError(f"Unknown entry type: {entry_type}")
+
+            legs.append({'wallet': wallet, 'amount': amount, 'type': entry_type})
+            deltas[wallet.id] = deltas.get(wallet.id, Decimal('0.00')) + delta
+
+        if total_debit != total_credit:
+            raise ValueError(f"Ledger Imbalance! Debit: {total_debit} != Credit: {total_credit}")
+
+        return legs, deltas
+
+    @staticmethod
+    def _lock_wallets(wallet_ids):
+        """
+        Locks every wallet touched by a posting in ONE 'SELECT ... FOR UPDATE'.
+        Rows are always locked in primary key order, so two postings sharing
+        wallets queue behind each other instead of deadlocking.
+        """
+        wallet_ids = set(wallet_ids)
+        locked = {wallet.id: wallet for wallet in LedgerService._locking_queryset(wallet_ids)}
+        if len(locked) != len(wallet_ids):
+            raise Wallet.DoesNotExist("One or more wallets in this transaction no longer exist.")
+        return locked
+
+    @staticmethod
+    def _locking_queryset(wallet_ids):
+        # Owners ride along in the same query (for notifications); only wallet rows are locked
+        return (
+            Wallet.objects.select_for_update(of=('self',))
+            .select_related('owner')
+            .filter(id__in=wallet_ids)
+            .order_by('pk')
+        )
+
+    @staticmethod
+    def _prefetch_owners(wallets):
+        """Loads the owners of caller-supplied wallets in one query (instead of one per leg)."""
+        missing = {
+            wallet.owner_id: wallet for wallet in wallets
+            if wallet.owner_id and not Wallet.owner.is_cached(wallet)
+        }
+        if not missing:
+            return
+        owners = get_user_model().objects.in_bulk(list(missing))
+        for wallet in wallets:
+            if wallet.owner_id in owners:
+                Wallet.owner.field.set_cached_value(wallet, owners[wallet.owner_id])
+
+    @staticmethod
+    def _publish_notifications(notifications):
+        """
+        One grouped broker message per DB transaction, published only after it
+        commits: rolled-back postings never notify anyone, and no broker round
+        trip happens while row locks are held. Digest-mode credits are buffered instead.
+        robust=True: a broker outage is logged, it never fails a posting that already committed.
+        """
+        if notifications:
+            transaction.on_commit(lambda: publish_notifications(notifications), robust=True)
+
+    @staticmethod
+    def _apply_atomic(legs, deltas):
+        """
+        Applies the net change per wallet with 'UPDATE ... RETURNING balance, owner_id'.
+        No read-modify-write round trip: the row lock is taken and released by
+        the UPDATE itself. Returns the balance of each wallet BEFORE this posting.
+        The legs' wallets get the row's owner_id: callers may pass stand-ins
+        (CommissionService.net_wallet) that do not carry it.
+        """
+        wallet_types = {leg['wallet'].id: leg['wallet'].wallet_type for leg in legs}
+        owner_field = Wallet._meta.get_field('owner')
+        owners = {}
+        table = connection.ops.quote_name(Wallet._meta.db_table)
+        pk_field = Wallet._meta.pk
+        opening = {}
+
+        with connection.cursor() as cursor:
+            # Same pk order as _lock_wallets, so mixed-mode traffic cannot deadlock either
+            for wallet_id in sorted(deltas):
+                delta = deltas[wallet_id]
+                db_id = pk_field.get_db_prep_value(wallet_id, connection)
+                guarded = delta < 0 and wallet_types[wallet_id] in Wallet.USER_TYPES
+
+                if guarded:
+                    cursor.execute(
+                        f"UPDATE {table} SET balance = balance + %s WHERE id = %s AND balance >= %s RETURNING balance, owner_id",
+                        [delta, db_id, -delta]
+                    )
+                else:
+                    cursor.execute(
+                        f"UPDATE {table} SET balance = balance + %s WHERE id = %s RETURNING balance, owner_id",
+                        [delta, db_id]
+                    )
+
+                row = cursor.fetchone()
+                if row is None:
+                    if guarded and Wallet.objects.filter(id=wallet_id).exists():
+                        raise InsufficientFundsError("Insufficient funds")
+                    raise Wallet.DoesNotExist("One or more wallets in this transaction no longer exist.")
+
+                closing = Decimal(str(row[0])).quantize(Decimal('0.01'))
+                opening[wallet_id] = closing - delta
+                owners[wallet_id] = owner_field.to_python(row[1])
+
+        for leg in legs:
+            wallet = leg['wallet']
+            if wallet.owner_id != owners[wallet.id]:
+                wallet.owner_id = owners[wallet.id]
+
+        return opening
+
+    @staticmethod
+    def _deferred_wallets(legs, defer_system):
+        """Wallet ids whose legs go to the journal instead of Wallet.balance."""
+        if defer_system is None:
+            defer_system = settings.LEDGER_DEFER_SYSTEM_POSTINGS
+        if not defer_system:
+            return set()
+        return {leg['wallet'].id for leg in legs if leg['wallet'].wallet_type not in Wallet.USER_TYPES}
+
+    @staticmethod
+    def _build_entries(tx, legs, wallets, running, deferred, notifications):
+        """
+        Walks the legs in caller order so every entry gets its own balance snapshot.
+        'running' holds the current balance per synchronous wallet and is advanced in place;
+        owner notifications are appended to 'notifications' (published on commit).
+        Returns the unsaved LedgerEntry and WalletJournalEntry rows.
+        """
+        reference = tx.reference
+        ledger_entries = []
+        journal_entries = []
+
+        for leg in legs:
+            wallet = wallets.get(leg['wallet'].id, leg['wallet'])
+            amount = leg['amount']
+            entry_type = leg['type']
+
+            # Deferred system leg: entry now, balance at the next rollup
+            if wallet.id in deferred:
+                entry = LedgerEntry(transaction=tx, wallet=wallet, owner_id=wallet.owner_id, amount=amount, entry_type=entry_type)
+                delta = -amount if entry_type == LedgerEntry.EntryType.DEBIT else amount
+                ledger_entries.append(entry)
+                journal_entries.append(WalletJournalEntry(wallet=wallet, ledger_entry=entry, delta=delta))
+                continue
+
+            if entry_type == LedgerEntry.EntryType.DEBIT:
+                running[wallet.id] -= amount
+                wallet.balance = running[wallet.id]
                 
                 # --- NOTIFICATION (DEBIT) ---
                 if wallet.owner:
                     # 1. SMS (Mock/Real)
                     msg = f"Debit: KES {amount:,.2f} sent. Ref: {reference}. Bal: {wallet.balance:,.2f}"
-                    send_sms_task.delay(wallet.owner.phone_number, msg)
+                    notifications.append({'channel': 'sms', 'to': wallet.owner.phone_number, 'message': msg})
                     
                     # 2. EMAIL (Receipt) - Always send for debits
                     if wallet.owner.email:
@@ -64,34 +536,228 @@ class LedgerService:
                         <p><b>Reference:</b> {reference}</p>
                         <p><b>New Balance:</b> KES {wallet.balance:,.2f}</p>
                         """
-                        send_email_task.delay(wallet.owner.email, "Money Sent", email_body)
+                        notifications.append({'channel': 'email', 'to': wallet.owner.email, 'subject': "Money Sent", 'html': email_body})
 
             else:
-                total_credit += amount
-                wallet.balance += amount
+                running[wallet.id] += amount
+                wallet.balance = running[wallet.id]
                 
                 # --- NOTIFICATION (CREDIT) ---
                 if wallet.owner:
                     msg = f"Credit: KES {amount:,.2f} received. Ref: {reference}. Bal: {wallet.balance:,.2f}"
-                    send_sms_task.delay(wallet.owner.phone_number, msg)
-            
-            wallet.save()
+                    note = {'channel': 'sms', 'to': wallet.owner.phone_number, 'message': msg}
 
-            LedgerEntry.objects.create(
+                    # Digest mode: buffered and summarized every few minutes (falls back to 'note')
+                    digest_to = {
+                        Wallet.CreditAlerts.SMS_DIGEST: wallet.owner.phone_number,
+                        Wallet.CreditAlerts.EMAIL_DIGEST: wallet.owner.email,
+                    }.get(wallet.credit_alerts)
+                    if digest_to:
+                        note['digest'] = {
+                            'wallet': str(wallet.id), 'mode': wallet.credit_alerts,
+                            'to': digest_to, 'amount': str(amount)
+                        }
+                    notifications.append(note)
+
+            ledger_entries.append(LedgerEntry(
                 transaction=tx,
                 wallet=wallet,
+                owner_id=wallet.owner_id,
                 amount=amount,
                 entry_type=entry_type,
                 balance_after=wallet.balance
-            )
+            ))
 
-        if total_debit != total_credit:
-            raise ValueError(f"Ledger Imbalance! Debit: {total_debit} != Credit: {total_credit}")
+        return ledger_entries, journal_entries
+
+    @staticmethod
+    @transaction.atomic
+    def process_transaction(reference, description, tx_type, entries, status=Transaction.Status.COMPLETED, mode=PostingMode.LOCKED, defer_system=None):
+        """
+        Posts a balanced set of legs.
+        defer_system: journal system-wallet legs instead of touching their balance
+        (None -> settings.LEDGER_DEFER_SYSTEM_POSTINGS). User legs stay synchronous.
+        """
+        # 1. Validate & merge (no locks held yet)
+        legs, deltas = LedgerService._prepare_entries(entries)
+
+        deferred = LedgerService._deferred_wallets(legs, defer_system)
+        sync_legs = [leg for leg in legs if leg['wallet'].id not in deferred]
+        sync_deltas = {wallet_id: delta for wallet_id, delta in deltas.items() if wallet_id not in deferred}
+
+        # 2. Move the (synchronous) balances
+        if mode == PostingMode.ATOMIC:
+            opening = LedgerService._apply_atomic(sync_legs, sync_deltas)
+            locked = {}
+            LedgerService._prefetch_owners([leg['wallet'] for leg in sync_legs])
+        else:
+            # Lock each affected wallet once, in a deterministic order
+            locked = LedgerService._lock_wallets(sync_deltas.keys())
+            opening = {wallet_id: wallet.balance for wallet_id, wallet in locked.items()}
+
+        tx = Transaction.objects.create(
+            reference=reference,
+            transaction_type=tx_type,
+            description=description,
+            status=status
+        )
+
+        # 3. Per-leg entries with balance snapshots
+        running = dict(opening)
+        notifications = []
+        ledger_entries, journal_entries = LedgerService._build_entries(tx, legs, locked, running, deferred, notifications)
+
+        # 4. Batched writes: one UPDATE for all balances, one INSERT for all entries
+        if locked:
+            Wallet.objects.bulk_update(locked.values(), ['balance'])
+        LedgerEntry.objects.bulk_create(ledger_entries)
+        if journal_entries:
+            WalletJournalEntry.objects.bulk_create(journal_entries)
+
+        # Hand the caller's instances their new balance (views echo it back)
+        for leg in sync_legs:
+            leg['wallet'].balance = running[leg['wallet'].id]
+
+        LedgerService._publish_notifications(notifications)
         
         return tx
 
     @staticmethod
-    def execute_transfer(source_wallet, destination_wallet, amount, request_user, custom_description=None):
+    @transaction.atomic
+    def process_batch(transactions, all_or_nothing=False, defer_system=None):
+        """
+        Posts many transactions in ONE database transaction.
+        Each item: {'reference', 'description', 'tx_type', 'entries', 'status' (optional)}.
+
+        Every item is validated before any lock is taken. The union of wallets is
+        locked once, each wallet gets one balance UPDATE (its net change) and all
+        rows are bulk inserted. balance_after is still exact per entry.
+
+        Returns one result per item, in order:
+            {'reference': ..., 'ok': True, 'transaction': <Transaction>}
+            {'reference': ..., 'ok': False, 'error': '...'}
+        A bad item is skipped and reported, unless all_or_nothing=True, in which
+        case it raises ValueError and nothing is written.
+        """
+        results = [None] * len(transactions)
+        prepared = []
+
+        def reject(index, reference, error):
+            if all_or_nothing:
+                raise ValueError(f"{reference}: {error}")
+            results[index] = {'reference': reference, 'ok': False, 'error': error}
+
+        # 1. Validate everything up front (no locks held yet)
+        references = [item.get('reference') for item in transactions]
+        existing = set(
+            Transaction.objects.filter(reference__in=[ref for ref in references if ref]).values_list('reference', flat=True)
+        )
+        seen = set()
+
+        for index, item in enumerate(transactions):
+            reference = item.get('reference')
+            if not reference:
+                reject(index, reference, "Missing reference")
+                continue
+            if reference in existing or reference in seen:
+                reject(index, reference, "Duplicate reference")
+                continue
+            if not item.get('tx_type'):
+                reject(index, reference, "Missing tx_type")
+                continue
+            try:
+                legs, deltas = LedgerService._prepare_entries(item.get('entries') or [])
+            except (ValueError, KeyError, ArithmeticError) as e:
+                reject(index, reference, str(e))
+                continue
+            if not legs:
+                reject(index, reference, "No entries")
+                continue
+
+            seen.add(reference)
+            prepared.append((index, item, legs, deltas))
+
+        # 2. Lock the union of wallets once, in pk order
+        all_legs = [leg for _, _, legs, _ in prepared for leg in legs]
+        deferred = LedgerService._deferred_wallets(all_legs, defer_system)
+        sync_ids = {leg['wallet'].id for leg in all_legs} - deferred
+
+        locked = {wallet.id: wallet for wallet in LedgerService._locking_queryset(sync_ids)}
+        running = {wallet_id: wallet.balance for wallet_id, wallet in locked.items()}
+
+        # 3. Build every row in memory, in batch order
+        tx_rows = []
+        ledger_entries = []
+        journal_entries = []
+        notifications = []
+
+        for index, item, legs, deltas in prepared:
+            reference = item['reference']
+            missing = [leg for leg in legs if leg['wallet'].id not in locked and leg['wallet'].id not in deferred]
+            if missing:
+                reject(index, reference, "Wallet not found")
+                continue
+
+            tx = Transaction(
+                reference=reference,
+                transaction_type=item['tx_type'],
+                description=item.get('description', ''),
+                status=item.get('status', Transaction.Status.COMPLETED)
+            )
+            entries, journal = LedgerService._build_entries(tx, legs, locked, running, deferred, notifications)
+
+            tx_rows.append(tx)
+            ledger_entries.extend(entries)
+            journal_entries.extend(journal)
+            results[index] = {'reference': reference, 'ok': True, 'transaction': tx}
+
+        # 4. Batched writes: net balance per wallet, then bulk inserts
+        touched = [locked[wallet_id] for wallet_id in {entry.wallet_id for entry in ledger_entries} if wallet_id in locked]
+        if touched:
+            Wallet.objects.bulk_update(touched, ['balance'])
+        Transaction.objects.bulk_create(tx_rows)
+        LedgerEntry.objects.bulk_create(ledger_entries)
+        if journal_entries:
+            WalletJournalEntry.objects.bulk_create(journal_entries)
+
+        LedgerService._publish_notifications(notifications)
+
+        return results
+
+    @staticmethod
+    def rollup_journal(limit=5000):
+        """
+        Folds pending WalletJournalEntry rows into Wallet.balance.
+        Safe to run from several workers: claimed rows are skipped by the others.
+        Returns the number of journal rows rolled up.
+        """
+        with transaction.atomic():
+            pending = list(
+                WalletJournalEntry.objects.select_for_update(skip_locked=True)
+                .filter(rolled_up_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'wallet_id', 'delta')[:limit]
+            )
+            if not pending:
+                return 0
+
+            totals = {}
+            for _, wallet_id, delta in pending:
+                totals[wallet_id] = totals.get(wallet_id, Decimal('0.00')) + delta
+
+            wallets = LedgerService._lock_wallets(totals.keys())
+            for wallet_id, wallet in wallets.items():
+                wallet.balance += totals[wallet_id]
+            Wallet.objects.bulk_update(wallets.values(), ['balance'])
+
+            WalletJournalEntry.objects.filter(
+                id__in=[row[0] for row in pending]
+            ).update(rolled_up_at=timezone.now())
+
+        return len(pending)
+
+    @staticmethod
+    def execute_transfer(source_wallet, destination_wallet, amount, request_user, custom_description=None, mode=PostingMode.LOCKED):
         amount = Decimal(str(amount))
         
         if not custom_description:
@@ -100,7 +766,7 @@ class LedgerService:
         # 1. LOCKED TRANSFER (Business -> Personal)
         if source_wallet.wallet_type == Wallet.Type.ORGANIZER:
             reference = f"TRF-LOCK-{uuid.uuid4().hex[:8].upper()}"
-            suspense_wallet = Wallet.objects.get(wallet_type=Wallet.Type.SUSPENSE)
+            suspense_wallet = Wallet.objects.system_wallet(Wallet.Type.SUSPENSE, reference)
             
             entries = [
                 {'wallet': source_wallet, 'amount': amount, 'type': LedgerEntry.EntryType.DEBIT},
@@ -112,16 +778,18 @@ class LedgerService:
                 description=f"{custom_description} (Pending Approval)",
                 tx_type=Transaction.Type.TRANSFER,
                 entries=entries,
-                status=Transaction.Status.PENDING_APPROVAL
+                status=Transaction.Status.PENDING_APPROVAL,
+                mode=mode
             )
             
-            # Email Alert: Pending
+            # Email Alert: Pending (after commit, like the ledger notifications)
             if source_wallet.owner and source_wallet.owner.email:
-                send_email_task.delay(
-                    source_wallet.owner.email, 
+                owner_email = source_wallet.owner.email
+                transaction.on_commit(lambda: send_email_task.delay(
+                    owner_email, 
                     "Transfer Pending Approval", 
                     f"Your transfer of KES {amount} requires admin approval."
-                )
+                ), robust=True)
             
             return tx
 
@@ -138,16 +806,18 @@ class LedgerService:
                 description=custom_description,
                 tx_type=Transaction.Type.TRANSFER,
                 entries=entries,
-                status=Transaction.Status.COMPLETED
+                status=Transaction.Status.COMPLETED,
+                mode=mode
             )
             
             # P2P Specific Email to Recipient
             if destination_wallet.owner and destination_wallet.owner != request_user:
                  if destination_wallet.owner.email:
-                     send_email_task.delay(
-                         destination_wallet.owner.email,
+                     recipient_email = destination_wallet.owner.email
+                     transaction.on_commit(lambda: send_email_task.delay(
+                         recipient_email,
                          "You Received Money!",
                          f"<h3>Good news!</h3><p>You received <b>KES {amount:,.2f}</b> from {request_user.username}.</p>"
-                     )
+                     ), robust=True)
 
             return tx
\ No newline at end of file
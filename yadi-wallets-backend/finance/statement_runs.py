@@ -0,0 +1,122 @@
+"""
+Month-end statements for every ORGANIZER wallet, written as gzipped CSV to
+MEDIA_ROOT/<STATEMENT_ARCHIVE_DIR>/<YYYY-MM>/<wallet_id>.csv.gz.
+
+Wallets are split into shards; each shard is rendered by one worker process
+(the `generate_statements` command's process pool, or one Celery task per
+shard) with one query for the opening balances and one streaming query for
+all of its wallets' entries in the month.
+
+A statement file only appears (atomic rename) once it is complete, so the
+files themselves are the checkpoint: a re-run skips wallets already done and
+a crashed run resumes where it stopped.
+"""
+import gzip
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import statements
+from .models import LedgerEntry, Wallet
+from .services import BalanceService
+
+logger = logging.getLogger(__name__)
+
+
+def month_period(month=None):
+    """'YYYY-MM' (default: last month) -> (label, start, end) for created_at >= start, < end."""
+    if month:
+        try:
+            first = datetime.strptime(month, "%Y-%m").date()
+        except ValueError:
+            raise statements.StatementError("month must look like YYYY-MM")
+    else:
+        today = timezone.localdate()
+        first = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+    following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    start = timezone.make_aware(datetime.combine(first, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(following, datetime.min.time()))
+    if end > timezone.now():
+        raise statements.StatementError(f"{first:%Y-%m} has not ended yet")
+    return f"{first:%Y-%m}", start, end
+
+
+def archive_path(label, wallet_id):
+    return Path(settings.MEDIA_ROOT) / settings.STATEMENT_ARCHIVE_DIR / label / f"{wallet_id}.csv.gz"
+
+
+def plan(label, shard_count, force=False):
+    """Organizer wallet ids still missing a statement for 'label', dealt round-robin into shards."""
+    wallet_ids = Wallet.objects.filter(wallet_type=Wallet.Type.ORGANIZER).order_by('id').values_list('id', flat=True)
+    pending = [str(wallet_id) for wallet_id in wallet_ids if force or not archive_path(label, wallet_id).exists()]
+    shards = [pending[i::shard_count] for i in range(max(shard_count, 1))]
+    return [shard for shard in shards if shard]
+
+
+def render_shard(month, wallet_ids):
+    """
+    Writes the statements of one shard. Returns {'wallets', 'entries', 'seconds'}.
+    Safe to run in a fresh process (opens its own DB connection).
+    """
+    label, start, end = month_period(month)
+    started = time.monotonic()
+    directory = archive_path(label, 'x').parent
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # 1. Opening balances from the balance checkpoints, three queries for the whole shard
+    openings = BalanceService.balances_at(wallet_ids, start)
+    wallets = {
+        str(row['id']): dict(row, opening=openings[row['id']])
+        for row in Wallet.objects.filter(id__in=wallet_ids).values('id', 'label')
+    }
+
+    # 2. Every entry of the shard in the month, one streaming query, wallet by wallet
+    rows = (
+        LedgerEntry.objects.filter(wallet_id__in=wallet_ids, created_at__gte=start, created_at__lt=end)
+        .order_by('wallet_id', 'created_at', 'id')
+        .values_list('wallet_id', *statements.COLUMNS)
+        .iterator(chunk_size=settings.STATEMENT_CHUNK_SIZE)
+    )
+
+    entries = 0
+    done = set()
+    for wallet_id, group in groupby(rows, key=lambda row: str(row[0])):
+        entries += _write(label, start, end, wallets[wallet_id], (row[1:] for row in group))
+        done.add(wallet_id)
+
+    # 3. Wallets without entries this month still get their (flat) statement
+    for wallet_id in wallets.keys() - done:
+        _write(label, start, end, wallets[wallet_id], ())
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Statements {label}: shard of {len(wallets)} wallets, {entries} entries in {elapsed:.1f}s")
+    return {'wallets': len(wallets), 'entries': entries, 'seconds': elapsed}
+
+
+def _write(label, start, end, row, entries):
+    """One wallet's statement -> temp file -> atomic rename. Returns the entry count."""
+    wallet = Wallet(id=row['id'], label=row['label'])
+    path = archive_path(label, wallet.id)
+    partial = path.with_suffix('.gz.part')
+
+    count = 0
+
+    def counted():
+        nonlocal count
+        for entry in entries:
+            count += 1
+            yield entry
+
+    lines = statements.lines(wallet, start, end, opening=row['opening'], rows=counted())
+    with gzip.open(partial, 'wb') as out:
+        for chunk in statements.encode(lines, 'csv'):
+            out.write(chunk)
+    os.replace(partial, path)
+    return count
@@ -0,0 +1,139 @@
+"""
+Account statements, streamed as CSV or NDJSON.
+
+Entries are read from a server-side cursor (.iterator(chunk_size=STATEMENT_CHUNK_SIZE))
+and written out as they arrive, so memory stays flat whatever the statement length.
+Layout: an opening balance, one line per entry with its running balance, and a
+closing line with the period's totals.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from config.renderers import dumps
+from .models import LedgerEntry
+from .services import BalanceService
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Entry columns a statement reads, in order
+COLUMNS = (
+    'created_at', 'transaction__reference', 'transaction__transaction_type',
+    'transaction__description', 'entry_type', 'amount',
+)
+CSV_HEADER = ['date', 'reference', 'type', 'description', 'debit', 'credit', 'balance']
+
+
+class StatementError(ValueError):
+    """Bad statement parameters (reported to the caller as a 400)."""
+
+
+def parse_period(date_from=None, date_to=None):
+    """
+    'YYYY-MM-DD' bounds, both optional and inclusive -> (start, end) aware datetimes
+    for created_at >= start, created_at < end. start is None for "from the first entry";
+    end never lies in the future, so entries posted while streaming stay out.
+    """
+    def parse(value, name):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise StatementError(f"'{name}' must be a date (YYYY-MM-DD)")
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    now = timezone.now()
+    start = parse(date_from, 'from') if date_from else None
+    end = min(parse(date_to, 'to') + timedelta(days=1), now) if date_to else now
+    if start and start >= end:
+        raise StatementError("'from' must be on or before 'to' (and not in the future)")
+    return start, end
+
+
+def lines(wallet, start, end, opening=None, rows=None):
+    """
+    Yields the statement as dicts: one 'opening', an 'entry' per ledger entry, one 'closing'.
+    Bulk runs pass the 'opening' balance and the wallet's 'rows' (COLUMNS tuples, oldest
+    first) they already have; otherwise both are queried here.
+    """
+    if opening is None:
+        opening = BalanceService.balance_at(wallet, start) if start else Decimal('0.00')
+    balance = opening
+    period = {
+        'from': start.date().isoformat() if start else None,
+        'to': (end - timedelta(microseconds=1)).date().isoformat(),
+    }
+    yield {'type': 'opening', 'wallet': wallet.id, 'label': wallet.label, 'balance': balance, **period}
+
+    if rows is None:
+        entries = LedgerEntry.objects.filter(wallet=wallet, created_at__lt=end)
+        if start:
+            entries = entries.filter(created_at__gte=start)
+        rows = entries.order_by('created_at', 'id').values_list(*COLUMNS).iterator(chunk_size=settings.STATEMENT_CHUNK_SIZE)
+
+    debit = LedgerEntry.EntryType.DEBIT
+    count, debits, credits = 0, Decimal('0.00'), Decimal('0.00')
+    for created_at, reference, tx_type, description, entry_type, amount in rows:
+        if entry_type == debit:
+            balance -= amount
+            debits += amount
+        else:
+            balance += amount
+            credits += amount
+        count += 1
+        yield {
+            'type': 'entry', 'date': created_at, 'reference': reference, 'transaction_type': tx_type,
+            'description': description, 'entry_type': entry_type, 'amount': amount, 'balance': balance,
+        }
+
+    yield {'type': 'closing', 'balance': balance, 'entries': count, 'debits': debits, 'credits': credits, **period}
+
+
+def _csv_row(line):
+    if line['type'] == 'entry':
+        is_debit = line['entry_type'] == LedgerEntry.EntryType.DEBIT
+        return [
+            line['date'].strftime("%Y-%m-%d %H:%M:%S"), line['reference'], line['transaction_type'], line['description'],
+            line['amount'] if is_debit else '', '' if is_debit else line['amount'], line['balance'],
+        ]
+    if line['type'] == 'opening':
+        return [line['from'] or '', '', 'OPENING', f"Opening balance ({line['label']})", '', '', line['balance']]
+    return [line['to'], '', 'CLOSING', f"Closing balance ({line['entries']} entries)", line['debits'], line['credits'], line['balance']]
+
+
+def encode(statement, fmt):
+    """Statement lines -> bytes, flushed every STATEMENT_CHUNK_SIZE lines."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(CSV_HEADER)
+
+    chunk = []
+    for n, line in enumerate(statement, start=1):
+        if fmt == 'csv':
+            writer.writerow(_csv_row(line))
+        else:
+            chunk.append(dumps(line))
+            chunk.append(b'\n')
+
+        if n % settings.STATEMENT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode() if fmt == 'csv' else b''.join(chunk)
+            buffer.seek(0)
+            buffer.truncate()
+            chunk = []
+
+    yield buffer.getvalue().encode() if fmt == 'csv' else b''.join(chunk)
+
+
+def statement_response(wallet, fmt, start, end):
+    """StreamingHttpResponse with the wallet's statement for [start, end) in 'csv' or 'ndjson'."""
+    response = StreamingHttpResponse(encode(lines(wallet, start, end), fmt), content_type=FORMATS[fmt])
+    period = f"{start.date() if start else 'start'}_{(end - timedelta(microseconds=1)).date()}"
+    response['Content-Disposition'] = f'attachment; filename="statement-{wallet.id}-{period}.{fmt}"'
+    return response
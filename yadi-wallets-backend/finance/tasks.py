@@ -0,0 +1,52 @@
+from celery import shared_task
+from django.conf import settings
+from .services import LedgerService, BalanceService
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task(ignore_result=True)
+def rollup_system_journal_task():
+    """
+    Periodic (Celery beat): folds deferred system-wallet postings into Wallet.balance.
+    Drains the journal in chunks so a backlog clears in one run.
+    """
+    total = 0
+    while True:
+        rolled = LedgerService.rollup_journal()
+        total += rolled
+        if not rolled:
+            break
+
+    if total:
+        logger.info(f"Journal rollup: folded {total} system-wallet postings")
+    return total
+
+
+@shared_task(ignore_result=True)
+def build_balance_checkpoints_task():
+    """Periodic (Celery beat): checkpoints wallet balances for the days that closed since the last run."""
+    return BalanceService.build_checkpoints()
+
+
+@shared_task(ignore_result=True)
+def generate_monthly_statements_task(month=None):
+    """
+    Monthly (Celery beat): fans last month's organizer statements out as one
+    task per shard, so the worker pool renders them in parallel. Wallets whose
+    statement already exists are skipped, so re-running resumes a broken run.
+    """
+    from . import statement_runs
+
+    label, _, _ = statement_runs.month_period(month)
+    shards = statement_runs.plan(label, settings.STATEMENT_SHARDS)
+    for shard in shards:
+        render_statement_shard_task.delay(label, shard)
+    logger.info(f"Statements {label}: {sum(map(len, shards))} wallets queued in {len(shards)} shards")
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def render_statement_shard_task(month, wallet_ids):
+    from . import statement_runs
+
+    return statement_runs.render_shard(month, wallet_ids)
@@ -1,3 +1,14 @@
 from django.test import TestCase
 
-# Create your tests here.
+
+class FeeQuoteTests(TestCase):
+    def test_rejects_unusable_amounts(self):
+        for amount in ('', 'abc', '0', '-5', 'NaN', 'sNaN', 'Infinity', '-Infinity', '1e100', '100000000'):
+            response = self.client.get('/api/finance/fees/quote/', {'amount': amount})
+            self.assertEqual(response.status_code, 400, amount)
+            self.assertEqual(response.json(), {"error": "Invalid amount"})
+
+    def test_quotes_valid_amount(self):
+        response = self.client.get('/api/finance/fees/quote/', {'amount': '1500'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['amount'], '1500.00')
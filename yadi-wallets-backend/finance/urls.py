@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import TransactionHistoryView, WalletManagementView, TransferFundsView, InitiateWithdrawalView
+from .views import TransactionHistoryView, WalletManagementView, TransferFundsView, InitiateWithdrawalView, FeeQuoteView, StatementExportView
 
 urlpatterns = [
     
@@ -9,5 +9,7 @@ urlpatterns = [
     path('transfer/', TransferFundsView.as_view(), name='wallet-transfer'),
     path('withdraw/', InitiateWithdrawalView.as_view(), name='withdraw-funds'),
     path('history/', TransactionHistoryView.as_view(), name='transaction-history'),
+    path('fees/quote/', FeeQuoteView.as_view(), name='fee-quote'),
+    path('statement/', StatementExportView.as_view(), name='statement-export'),
     
 ]
\ No newline at end of file
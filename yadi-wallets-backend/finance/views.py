@@ -4,14 +4,22 @@ from rest_framework import permissions, status
 from decimal import Decimal
 from django.db.models import Sum, Q
 from .models import Wallet, LedgerEntry, Transaction
-from .services import LedgerService, FeeService
+from .services import LedgerService, FeeService, PostingMode, InsufficientFundsError
 from integrations.mpesa import MpesaGateway
 from users.models import User
 import uuid
-from rest_framework.pagination import PageNumberPagination
+from .pagination import KeysetPagination
+from . import history, statements
+from config.renderers import CSVRenderer, NDJSONRenderer
+from rest_framework.authentication import SessionAuthentication
+from users.authentication import ClaimsJWTCookieAuthentication
+
+# request.user comes from the JWT claims (no user query); see users.authentication
+USER_AUTHENTICATION = [ClaimsJWTCookieAuthentication, SessionAuthentication]
 
 # --- 1. WALLET MANAGEMENT (Create & List) ---
 class WalletManagementView(APIView):
+    authentication_classes = USER_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
@@ -28,7 +36,8 @@ class WalletManagementView(APIView):
                 "balance": w.balance, 
                 "currency": w.currency.code,
                 "is_primary": w.is_primary,
-                "is_frozen": w.is_frozen
+                "is_frozen": w.is_frozen,
+                "credit_alerts": w.credit_alerts
             } for w in qs]
 
         return Response({
@@ -40,8 +49,8 @@ class WalletManagementView(APIView):
         """Create a new Custom Goal Wallet (Personal Only)"""
         label = request.data.get('label', 'New Wallet')
         
-        # Get default currency (KES)
-        currency = Wallet.objects.filter(wallet_type=Wallet.Type.MASTER_LIQUIDITY).first().currency
+        # Get default currency (same as the Master Liquidity float; registry, no query)
+        currency_id = Wallet.objects.system_wallet(Wallet.Type.MASTER_LIQUIDITY).currency_id
 
         # Limit: Max 5 personal wallets to prevent spam
         if Wallet.objects.filter(owner=request.user, wallet_type=Wallet.Type.CUSTOMER).count() >= 5:
@@ -51,7 +60,7 @@ class WalletManagementView(APIView):
             owner=request.user,
             wallet_type=Wallet.Type.CUSTOMER,
             label=label,
-            currency=currency
+            currency_id=currency_id
         )
         return Response({
             "status": "created", 
@@ -60,8 +69,26 @@ class WalletManagementView(APIView):
             "balance": 0.00
         }, status=201)
 
+    def patch(self, request):
+        """Switch a wallet's credit alerts between per-payment SMS and a digest"""
+        wallet_id = request.data.get('wallet_id')
+        credit_alerts = request.data.get('credit_alerts')
+
+        if credit_alerts not in Wallet.CreditAlerts.values:
+            return Response({"error": f"credit_alerts must be one of {', '.join(Wallet.CreditAlerts.values)}"}, status=400)
+
+        try:
+            updated = Wallet.objects.filter(id=uuid.UUID(str(wallet_id)), owner=request.user).update(credit_alerts=credit_alerts)
+        except ValueError:
+            updated = 0
+        if not updated:
+            return Response({"error": "Wallet not found"}, status=404)
+
+        return Response({"status": "updated", "id": wallet_id, "credit_alerts": credit_alerts})
+
 # --- 2. TRANSFER FUNDS (Inter-Wallet & P2P) ---
 class TransferFundsView(APIView):
+    authentication_classes = USER_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
@@ -126,7 +153,8 @@ class TransferFundsView(APIView):
                 destination_wallet=dest, 
                 amount=amount, 
                 request_user=request.user,
-                custom_description=description
+                custom_description=description,
+                mode=PostingMode.ATOMIC
             )
 
             return Response({
@@ -136,6 +164,8 @@ class TransferFundsView(APIView):
                 "new_balance": source.balance
             })
 
+        except InsufficientFundsError:
+            return Response({"error": "Insufficient funds"}, status=400)
         except Wallet.DoesNotExist:
             return Response({"error": "Source wallet not found"}, status=404)
         except Exception as e:
@@ -143,15 +173,13 @@ class TransferFundsView(APIView):
 
 # --- 3. EXTERNAL WITHDRAWAL (M-Pesa) ---
 class InitiateWithdrawalView(APIView):
+    authentication_classes = USER_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         amount = Decimal(request.data.get('amount', '0'))
         source_id = request.data.get('source_wallet_id')
         
-        # Optional: Send to someone else (Remittance)
-        recipient = request.data.get('recipient_phone', request.user.phone_number)
-
         # 1. KYC CHECK (Blocking Rule)
         if not request.user.is_kyc_verified:
              return Response({
@@ -159,6 +187,12 @@ class InitiateWithdrawalView(APIView):
                  "code": "KYC_BLOCK"
              }, status=403)
 
+        # Optional: Send to someone else (Remittance)
+        # (the phone isn't in the token claims: loaded only when no recipient is given)
+        recipient = request.data.get('recipient_phone') or (
+            User.objects.filter(id=request.user.id).values_list('phone_number', flat=True).first()
+        )
+
         try:
             wallet = Wallet.objects.get(id=source_id, owner=request.user)
             
@@ -176,7 +210,7 @@ class InitiateWithdrawalView(APIView):
             # If Organizer Wallet -> It must go to Suspense (Approval)
             if wallet.wallet_type == Wallet.Type.ORGANIZER:
                 reference = f"WD-ORG-{uuid.uuid4().hex[:8].upper()}"
-                suspense_wallet = Wallet.objects.get(wallet_type=Wallet.Type.SUSPENSE)
+                suspense_wallet = Wallet.objects.system_wallet(Wallet.Type.SUSPENSE, reference)
                 
                 entries = [
                     {'wallet': wallet, 'amount': total_deduction, 'type': LedgerEntry.EntryType.DEBIT},
@@ -188,7 +222,8 @@ class InitiateWithdrawalView(APIView):
                     description=f"Withdrawal Request to {recipient}",
                     tx_type=Transaction.Type.WITHDRAWAL,
                     entries=entries,
-                    status=Transaction.Status.PENDING_APPROVAL
+                    status=Transaction.Status.PENDING_APPROVAL,
+                    mode=PostingMode.ATOMIC
                 )
                 return Response({"status": "pending_approval", "message": "Withdrawal pending admin review."})
 
@@ -196,8 +231,8 @@ class InitiateWithdrawalView(APIView):
             # Move: User -> Master (Cash Out) + Revenue (Fee)
             else:
                 reference = f"WD-P-{uuid.uuid4().hex[:8].upper()}"
-                master_wallet = Wallet.objects.get(wallet_type=Wallet.Type.MASTER_LIQUIDITY)
-                revenue_wallet = Wallet.objects.get(wallet_type=Wallet.Type.REVENUE)
+                master_wallet = Wallet.objects.system_wallet(Wallet.Type.MASTER_LIQUIDITY, reference)
+                revenue_wallet = Wallet.objects.system_wallet(Wallet.Type.REVENUE, reference)
                 
                 entries = [
                     # Debit User Full Amount
@@ -218,7 +253,8 @@ class InitiateWithdrawalView(APIView):
                     description=f"Withdrawal to {recipient}",
                     tx_type=Transaction.Type.WITHDRAWAL,
                     entries=entries,
-                    status=Transaction.Status.COMPLETED
+                    status=Transaction.Status.COMPLETED,
+                    mode=PostingMode.ATOMIC
                 )
 
                 # TRIGGER M-PESA
@@ -230,6 +266,11 @@ class InitiateWithdrawalView(APIView):
                     "new_balance": wallet.balance
                 })
 
+        except InsufficientFundsError:
+            return Response({
+                "error": f"Insufficient funds. You need KES {total_deduction} (Includes fees)",
+                "breakdown": fees
+            }, status=400)
         except Wallet.DoesNotExist:
             return Response({"error": "Wallet not found"}, status=404)
         except Exception as e:
@@ -238,53 +279,67 @@ class InitiateWithdrawalView(APIView):
 
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+# --- 4. FEE QUOTE (Preview while typing) ---
+class FeeQuoteView(APIView):
+    """
+    GET /api/finance/fees/quote/?amount=1500
+    Served from the in-memory fee schedule: no DB queries, no auth lookup.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    # Largest amount a fee band can hold (FeeConfiguration: 10 digits, 2 decimals)
+    max_amount = Decimal('99999999.99')
+
+    def get(self, request):
+        try:
+            amount = Decimal(request.query_params.get('amount', ''))
+        except ArithmeticError:
+            return Response({"error": "Invalid amount"}, status=400)
+        if not amount.is_finite() or amount <= 0 or amount > self.max_amount:
+            return Response({"error": "Invalid amount"}, status=400)
+
+        fees = FeeService.calculate_withdrawal_fees(amount.quantize(Decimal('0.01')))
+        return Response({"amount": amount.quantize(Decimal('0.01')), **fees})
 
 # --- NEW: Transaction History View (Paginated) ---
 class TransactionHistoryView(APIView):
+    """
+    GET /api/finance/history/?cursor=...&page_size=20[&count=true]
+    Keyset pages (see finance.pagination): follow 'next' / 'next_cursor'.
+    """
+    authentication_classes = USER_AUTHENTICATION
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
 
     def get(self, request):
-        # Get all wallets for user
-        wallets = Wallet.objects.filter(owner=request.user)
-        
-        # Get ALL entries (Removed exclude filter)
-        # Ordered by newest first
-        queryset = LedgerEntry.objects.filter(
-            wallet__in=wallets
-        ).select_related('transaction', 'wallet').order_by('-created_at')
-        
-        # Apply Pagination
+        # Get ALL entries across the user's wallets (Removed exclude filter)
+        # Ordered by newest first (the paginator orders by created_at, id): one scan of the owner index
+        queryset = history.project(LedgerEntry.objects.filter(owner=request.user), history.USER_FIELDS)
+
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(queryset, request)
-        
-        if page is not None:
-            data = self.serialize_entries(page)
-            return paginator.get_paginated_response(data)
-
-        # Fallback if pagination fails (shouldn't happen with correct setup)
-        data = self.serialize_entries(queryset)
-        return Response(data)
-
-    def serialize_entries(self, entries):
-        history = []
-        for entry in entries:
-            tx = entry.transaction
-            # If Debit, show negative. If Credit, show positive.
-            sign = -1 if entry.entry_type == LedgerEntry.EntryType.DEBIT else 1
-            
-            history.append({
-                "id": str(tx.id),
-                "type": tx.transaction_type,
-                "amount": float(entry.amount) * sign,
-                "status": tx.status,
-                "reference": tx.reference,
-                "description": tx.description,
-                "date": entry.created_at.strftime("%Y-%m-%d %H:%M"),
-                "wallet_label": entry.wallet.label
-            })
-        return history
\ No newline at end of file
+        return paginator.get_paginated_response(history.serialize(page, history.USER_FIELDS))
+
+
+# --- 5. STATEMENT EXPORT (Streamed) ---
+class StatementExportView(APIView):
+    """
+    GET /api/finance/statement/?wallet=<id>&from=YYYY-MM-DD&to=YYYY-MM-DD&format=csv|ndjson
+    The whole period in one streamed download (see finance.statements).
+    """
+    authentication_classes = USER_AUTHENTICATION
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request):
+        try:
+            start, end = statements.parse_period(request.query_params.get('from'), request.query_params.get('to'))
+        except statements.StatementError as e:
+            return Response({"error": str(e)}, status=400)
+
+        try:
+            wallet = Wallet.objects.get(id=uuid.UUID(str(request.query_params.get('wallet'))), owner=request.user)
+        except (ValueError, Wallet.DoesNotExist):
+            return Response({"error": "Wallet not found"}, status=404)
+
+        return statements.statement_response(wallet, request.accepted_renderer.format, start, end)
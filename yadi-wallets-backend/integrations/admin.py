@@ -1,13 +1,49 @@
-from django.contrib import admin
-from .models import ServiceClient
+from django.contrib import admin, messages
+from .authentication import revoke
+from .models import ServiceClient, WebhookOutbox
+
+def show_new_key(request, client):
+    messages.warning(request, f"🔑 API key for {client.name}: {client.plaintext_key} (copy it now, it is stored hashed and will not be shown again)")
+
+@admin.action(description='🔑 Rotate API Key (old key stops working)')
+def rotate_keys(modeladmin, request, queryset):
+    for client in queryset:
+        old_hash = client.key_hash
+        client.issue_key()
+        client.save(update_fields=['key_hash', 'key_prefix'])
+        revoke(old_hash)
+        show_new_key(request, client)
 
 @admin.register(ServiceClient)
 class ServiceClientAdmin(admin.ModelAdmin):
-    # This ensures you can see the key in the list view
-    list_display = ('name', 'api_key', 'is_active', 'created_at')
-    
-    # This allows you to see the key inside the edit page (as read-only)
-    readonly_fields = ('api_key',)
+    # Only the prefix is kept in clear: enough to tell keys apart
+    list_display = ('name', 'key_prefix', 'is_active', 'created_at')
+    readonly_fields = ('key_prefix',)
 
     # Use this to search if you have many clients
-    search_fields = ('name', 'api_key')
\ No newline at end of file
+    search_fields = ('name', 'key_prefix')
+    actions = [rotate_keys]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            show_new_key(request, obj)
+        elif 'is_active' in form.changed_data:
+            # Revocation (or reactivation) must reach every node's key cache now
+            revoke(obj.key_hash)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        revoke(obj.key_hash)
+
+    def delete_queryset(self, request, queryset):
+        key_hashes = list(queryset.values_list('key_hash', flat=True))
+        super().delete_queryset(request, queryset)
+        for key_hash in key_hashes:
+            revoke(key_hash)
+
+@admin.register(WebhookOutbox)
+class WebhookOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'endpoint', 'status', 'attempts', 'next_attempt_at', 'created_at', 'delivered_at')
+    list_filter = ('status', 'endpoint')
+    readonly_fields = ('events', 'last_error', 'created_at', 'delivered_at')
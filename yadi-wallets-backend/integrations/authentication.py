@@ -1,7 +1,108 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from . import pubsub
 from .models import ServiceClient
 
+logger = logging.getLogger(__name__)
+
+# Lookups go: in-process LRU (SERVICE_KEY_LRU_TTL) -> shared cache (SERVICE_KEY_CACHE_TTL) -> DB.
+# Revoking or rotating a key in the admin evicts it from all three immediately.
+CACHE_KEY = "service_key:{}"
+TOPIC = "service_keys"
+
+
+class KeyCache:
+    """Small thread-safe LRU of key hash -> client data (or None for a rejected key)."""
+
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key_hash):
+        """Returns (hit, value)."""
+        with self.lock:
+            entry = self.items.get(key_hash)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.items[key_hash]
+                return False, None
+            self.items.move_to_end(key_hash)
+            return True, value
+
+    def set(self, key_hash, value):
+        with self.lock:
+            self.items[key_hash] = (value, time.monotonic() + settings.SERVICE_KEY_LRU_TTL)
+            self.items.move_to_end(key_hash)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def evict(self, key_hash=None):
+        with self.lock:
+            if key_hash is None:
+                self.items.clear()
+            else:
+                self.items.pop(key_hash, None)
+
+
+_keys = KeyCache(settings.SERVICE_KEY_LRU_SIZE)
+
+
+def _on_invalidate(message):
+    # None: listener reconnected (messages may be lost); '*': drop everything
+    _keys.evict(None if message in (None, '*') else message)
+
+pubsub.subscribe(TOPIC, _on_invalidate)
+
+
+def revoke(key_hash):
+    """Evicts a key everywhere: this process, the shared cache, and every other process."""
+    _keys.evict(key_hash)
+    try:
+        cache.delete(CACHE_KEY.format(key_hash))
+    except Exception as e:
+        logger.error(f"Service key not evicted from the shared cache (expires within SERVICE_KEY_CACHE_TTL): {e}")
+    pubsub.publish(TOPIC, key_hash)
+
+
+def _lookup(key_hash):
+    """Client data {'id', 'name'} for an active key, None otherwise."""
+    hit, data = _keys.get(key_hash)
+    if hit:
+        return data
+
+    shared_key = CACHE_KEY.format(key_hash)
+    try:
+        shared = cache.get(shared_key)
+    except Exception:
+        shared = None
+
+    if shared is not None:
+        data = shared or None  # {} marks a rejected key
+    else:
+        client = ServiceClient.objects.filter(key_hash=key_hash, is_active=True).values('id', 'name').first()
+        data = {'id': str(client['id']), 'name': client['name']} if client else None
+        try:
+            # Rejected keys are remembered only briefly, so guessing doesn't fill the cache
+            cache.set(shared_key, data or {}, timeout=settings.SERVICE_KEY_CACHE_TTL if data else settings.SERVICE_KEY_LRU_TTL)
+        except Exception:
+            pass
+
+    _keys.set(key_hash, data)
+    return data
+
+
 class ServiceKeyAuthentication(BaseAuthentication):
     """
     Authenticates server-to-server requests using a secret API Key.
@@ -9,15 +110,25 @@ class ServiceKeyAuthentication(BaseAuthentication):
     """
     def authenticate(self, request):
         api_key = request.headers.get('X-Service-Key')
-        
+
         if not api_key:
             return None # Pass to next auth method (e.g., Session) if no key provided
 
-        try:
-            client = ServiceClient.objects.get(api_key=api_key, is_active=True)
-        except ServiceClient.DoesNotExist:
+        pubsub.ensure_listener()
+        data = _lookup(ServiceClient.hash_key(api_key))
+        if data is None:
             raise AuthenticationFailed('Invalid or inactive Service Key')
 
-        # Return (User, Auth) tuple. 
-        # We return the ServiceClient as the "User" context for these requests.
-        return (client, None)
\ No newline at end of file
+        # Return (User, Auth) tuple.
+        # We return the ServiceClient as the "User" context for these requests
+        # (built from the cached data, no query).
+        return (ServiceClient(id=data['id'], name=data['name'], is_active=True), None)
+
+    def authenticate_header(self, request):
+        return 'X-Service-Key'
+
+
+class IsServiceClient(BasePermission):
+    """Only requests authenticated with a Service Key."""
+    def has_permission(self, request, view):
+        return isinstance(request.user, ServiceClient)
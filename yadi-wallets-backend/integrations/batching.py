@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+
+from .digest import get_redis
+from .notifications import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# Redis list of JSON notification dicts waiting for the next batch
+QUEUE_KEY = "notify:queue"
+# Per worker process: what its last drain took and has not acknowledged yet
+PROCESSING_KEY = "notify:processing:{}"
+# Sorted set: worker -> when it last drained (finds the lists of dead workers)
+CLAIMS_KEY = "notify:processing"
+
+
+def enqueue(notifications):
+    """
+    Queues notification dicts for the batch sender. One round trip.
+    Returns False if Redis refused them (the caller should send them directly).
+    """
+    if not notifications:
+        return True
+    try:
+        get_redis().rpush(QUEUE_KEY, *[json.dumps(note) for note in notifications])
+        return True
+    except redis.RedisError as e:
+        logger.error(f"Notification queue unavailable: {e}")
+        return False
+
+
+def _worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _requeue(client, worker):
+    """Moves a worker's unacknowledged notifications back to the head of the queue, in order."""
+    processing = PROCESSING_KEY.format(worker)
+    count = client.llen(processing)
+    if count:
+        pipe = client.pipeline(transaction=False)
+        for _ in range(count):
+            pipe.lmove(processing, QUEUE_KEY, 'RIGHT', 'LEFT')
+        pipe.execute()
+        logger.warning(f"Requeued {count} unacknowledged notifications from {worker}")
+    client.zrem(CLAIMS_KEY, worker)
+    return count
+
+
+def drain(limit):
+    """
+    Takes up to 'limit' queued notifications (oldest first), one round trip.
+    They are moved (LMOVE) onto this worker's processing list, not popped:
+    call ack() once they are sent. Anything a previous drain of this worker
+    left unacknowledged is put back on the queue first.
+    """
+    client = get_redis()
+    worker = _worker()
+    _requeue(client, worker)
+
+    client.zadd(CLAIMS_KEY, {worker: time.time()})
+    pipe = client.pipeline(transaction=False)
+    for _ in range(limit):
+        pipe.lmove(QUEUE_KEY, PROCESSING_KEY.format(worker), 'LEFT', 'RIGHT')
+    return [json.loads(item) for item in pipe.execute() if item is not None]
+
+
+def ack():
+    """The last drain's notifications are sent (or handed to a retrying task): forget them."""
+    client = get_redis()
+    worker = _worker()
+    pipe = client.pipeline()
+    pipe.delete(PROCESSING_KEY.format(worker))
+    pipe.zrem(CLAIMS_KEY, worker)
+    pipe.execute()
+
+
+def release():
+    """Puts the last drain's notifications back on the queue (sending failed)."""
+    return _requeue(get_redis(), _worker())
+
+
+def recover():
+    """
+    Requeues what dead workers drained but never acknowledged (older than
+    NOTIFY_PROCESSING_LEASE). Returns the number of notifications put back.
+    """
+    client = get_redis()
+    stale = client.zrangebyscore(CLAIMS_KEY, 0, time.time() - settings.NOTIFY_PROCESSING_LEASE)
+    return sum(_requeue(client, worker) for worker in stale)
+
+
+def send_batch(notifications):
+    """
+    Groups notifications into provider calls. Only SMS with identical text
+    (broadcasts, digests sharing a template) coalesce into one bulk call; ledger
+    SMS carry their own reference and balance, so the rest go out together
+    through the pooled, concurrent sender. Emails go as Brevo message versions.
+    Returns [(note, success)] so each recipient can be retried on its own.
+    """
+    outcomes = []
+
+    sms_by_message = defaultdict(list)
+    emails = []
+    for note in notifications:
+        if note['channel'] == 'sms':
+            sms_by_message[note['message']].append(note)
+        else:
+            emails.append(note)
+
+    single = []
+    for message, notes in sms_by_message.items():
+        if len(notes) == 1:
+            single.extend(notes)
+            continue
+        results = NotificationService.send_sms_bulk([note['to'] for note in notes], message)
+        outcomes.extend((note, results.get(note['to'], False)) for note in notes)
+
+    if single:
+        outcomes.extend((note, success) for note, success, exc in NotificationService.send_many(single))
+
+    if emails:
+        results = NotificationService.send_email_bulk(emails)
+        outcomes.extend(zip(emails, results))
+
+    return outcomes
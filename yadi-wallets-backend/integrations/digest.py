@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis layout:
+#   notify:digest:<wallet_id>  hash {count, cents, first_at, mode, to}
+#   notify:digest:pending      set of wallet ids with a non-empty buffer
+KEY_PREFIX = "notify:digest:"
+PENDING_KEY = "notify:digest:pending"
+
+# --- REDIS: one client (connection pool) per process ---
+_client = None
+_client_lock = threading.Lock()
+
+def get_redis():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        return _client
+
+
+def buffer_credits(items):
+    """
+    Adds digest-mode credit notifications to their wallet's buffer, in one round trip.
+    items: instant notification dicts carrying a 'digest' part
+           {'wallet', 'mode', 'to', 'amount'}.
+    Returns (leftovers, full_wallets): leftovers are the items Redis refused, stripped
+    back to plain instant notifications; full_wallets reached NOTIFY_DIGEST_MAX_EVENTS.
+    """
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        now = int(time.time())
+        for item in items:
+            digest = item['digest']
+            key = f"{KEY_PREFIX}{digest['wallet']}"
+            pipe.hincrby(key, 'count', 1)
+            pipe.hincrby(key, 'cents', int(Decimal(digest['amount']) * 100))
+            pipe.hsetnx(key, 'first_at', now)
+            pipe.hset(key, mapping={'mode': digest['mode'], 'to': digest['to']})
+            pipe.sadd(PENDING_KEY, digest['wallet'])
+        results = pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Digest buffer unavailable, sending credits instantly: {e}")
+        return [{k: v for k, v in item.items() if k != 'digest'} for item in items], []
+
+    # 5 commands per item; the first is the new count
+    full = set()
+    for i, item in enumerate(items):
+        if results[i * 5] >= settings.NOTIFY_DIGEST_MAX_EVENTS:
+            full.add(item['digest']['wallet'])
+    return [], list(full)
+
+
+def due_wallets():
+    """Wallet ids whose buffer is old enough or big enough to send."""
+    client = get_redis()
+    wallet_ids = list(client.smembers(PENDING_KEY))
+    if not wallet_ids:
+        return []
+
+    pipe = client.pipeline(transaction=False)
+    for wallet_id in wallet_ids:
+        pipe.hmget(f"{KEY_PREFIX}{wallet_id}", 'count', 'first_at')
+    states = pipe.execute()
+
+    cutoff = time.time() - settings.NOTIFY_DIGEST_INTERVAL_MINUTES * 60
+    due = []
+    for wallet_id, (count, first_at) in zip(wallet_ids, states):
+        if count is None:
+            # Already flushed by someone else; drop the stale marker
+            client.srem(PENDING_KEY, wallet_id)
+            continue
+        if int(count) >= settings.NOTIFY_DIGEST_MAX_EVENTS or int(first_at) <= cutoff:
+            due.append(wallet_id)
+    return due
+
+
+def take(wallet_ids):
+    """
+    Atomically empties the given buffers (read + delete in one MULTI per wallet,
+    so a credit buffered meanwhile lands in the next digest, never in neither).
+    Returns {wallet_id: {'count', 'total', 'mode', 'to'}} for non-empty buffers.
+    """
+    client = get_redis()
+    taken = {}
+    for wallet_id in wallet_ids:
+        key = f"{KEY_PREFIX}{wallet_id}"
+        pipe = client.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.delete(key)
+        pipe.srem(PENDING_KEY, wallet_id)
+        state = pipe.execute()[0]
+        if state:
+            taken[wallet_id] = {
+                'count': int(state['count']),
+                'total': Decimal(state['cents']) / 100,
+                'mode': state['mode'],
+                'to': state['to'],
+            }
+    return taken
+
+
+def build_digest(digest, label, balance):
+    """Turns a taken buffer into one notification dict (see send_notifications_task)."""
+    count = digest['count']
+    noun = "payment" if count == 1 else "payments"
+    if digest['mode'] == 'EMAIL_DIGEST':
+        html = f"""
+        <h3>Payments Summary</h3>
+        <p><b>{count}</b> {noun} received on {label}, totalling <b>KES {digest['total']:,.2f}</b>.</p>
+        <p><b>Balance:</b> KES {balance:,.2f}</p>
+        """
+        return {'channel': 'email', 'to': digest['to'], 'subject': "Payments Summary", 'html': html}
+
+    msg = f"{count} {noun} received, KES {digest['total']:,.2f}. Bal: {balance:,.2f}"
+    return {'channel': 'sms', 'to': digest['to'], 'message': msg}
@@ -0,0 +1,32 @@
+import redis
+from django.core.management.base import BaseCommand
+from integrations import sms_router
+from integrations.batching import QUEUE_KEY, PROCESSING_KEY, CLAIMS_KEY
+from integrations.digest import get_redis, PENDING_KEY
+
+
+class Command(BaseCommand):
+    help = 'Shows SMS router circuit state per provider and the notification queue depth.'
+
+    def handle(self, *args, **options):
+        self.stdout.write("📡 SMS providers (totals: all workers | circuit: last worker to report):")
+        for name, metrics in sms_router.get_metrics().items():
+            totals = f"{metrics['calls']} calls, {metrics['errors']} errors"
+            state = metrics['circuit']
+            if state is None:
+                self.stdout.write(f"   {name:<15} {totals} | no recent traffic")
+                continue
+            style = self.style.SUCCESS if state['state'] == 'CLOSED' else self.style.ERROR
+            self.stdout.write(style(
+                f"   {name:<15} {totals} | {state['state']:<9} window {state['calls']:<4} "
+                f"errors {state['error_rate']:.0%} | p95 {state['p95_ms']:.0f}ms"
+            ))
+
+        try:
+            client = get_redis()
+            self.stdout.write(f"📬 Queued notifications: {client.llen(QUEUE_KEY)}")
+            taken = sum(client.llen(PROCESSING_KEY.format(worker)) for worker in client.zrange(CLAIMS_KEY, 0, -1))
+            self.stdout.write(f"⏳ Drained, not yet acknowledged: {taken}")
+            self.stdout.write(f"🧾 Wallets with a pending digest: {client.scard(PENDING_KEY)}")
+        except redis.RedisError as e:
+            self.stdout.write(self.style.ERROR(f"❌ Redis unavailable: {e}"))
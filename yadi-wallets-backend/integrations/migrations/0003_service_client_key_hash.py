@@ -0,0 +1,43 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_existing_keys(apps, schema_editor):
+    ServiceClient = apps.get_model('integrations', 'ServiceClient')
+    for client in ServiceClient.objects.all():
+        client.key_hash = hashlib.sha256(client.api_key.encode('utf-8')).hexdigest()
+        client.key_prefix = client.api_key[:12]
+        client.save(update_fields=['key_hash', 'key_prefix'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceclient',
+            name='key_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceclient',
+            name='key_prefix',
+            field=models.CharField(default='', editable=False, help_text='First characters of the key, to tell keys apart', max_length=16),
+            preserve_default=False,
+        ),
+        # Existing keys keep working: only their hash is kept from here on
+        migrations.RunPython(hash_existing_keys, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='serviceclient',
+            name='api_key',
+        ),
+        migrations.AlterField(
+            model_name='serviceclient',
+            name='key_hash',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
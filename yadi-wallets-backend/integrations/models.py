@@ -1,20 +1,37 @@
 import uuid
+import hashlib
 import secrets
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 class ServiceClient(models.Model):
     """
     Represents a trusted external service (e.g., 'Yadi Tickets Backend').
+    Only a SHA-256 hash of the API key is stored; the key itself is shown once, when issued.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, unique=True)
-    api_key = models.CharField(max_length=64, unique=True, editable=False)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    key_prefix = models.CharField(max_length=16, editable=False, help_text="First characters of the key, to tell keys apart")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @staticmethod
+    def hash_key(api_key):
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+    def issue_key(self):
+        """Generates a new key (replacing any old one) and returns it in plain text. Call save() after."""
+        api_key = f"sk_live_{secrets.token_urlsafe(32)}"
+        self.key_hash = self.hash_key(api_key)
+        self.key_prefix = api_key[:12]
+        self.plaintext_key = api_key
+        return api_key
+
     def save(self, *args, **kwargs):
-        if not self.api_key:
-            self.api_key = f"sk_live_{secrets.token_urlsafe(32)}"
+        if not self.key_hash:
+            self.issue_key()
         super().save(*args, **kwargs)
 
     @property
@@ -23,4 +40,35 @@ class ServiceClient(models.Model):
         return True
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class WebhookOutbox(models.Model):
+    """
+    Transactional outbox for webhooks to the tickets service.
+    Rows are written in the same DB transaction as the ledger posting and
+    delivered later by the dispatcher task (integrations.webhooks).
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        DELIVERED = 'DELIVERED', 'Delivered'
+        FAILED = 'FAILED', 'Failed (Gave Up)'
+
+    endpoint = models.URLField(max_length=255, help_text="Base URL of the receiving service")
+    events = models.JSONField(help_text='[{"reference": ..., "status": ...}]')
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=Q(status='PENDING'), name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} ({len(self.events)} events) - {self.status}"
@@ -1,12 +1,96 @@
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+import time
+
+from .sms_router import SmsRouter
 
 logger = logging.getLogger(__name__)
 
-# Toggle: Choose your provider here. 
-# In production, set SMS_PROVIDER='MOBITECH' in your .env / settings.py
-SMS_PROVIDER = getattr(settings, 'SMS_PROVIDER', 'MOCK') 
+# Providers: set SMS_PROVIDERS='MOBITECH,AFRICASTALKING' in your .env (failover order).
+# The router (see sms_router.py) picks one per message based on health and latency.
+
+# Provider-side batch limits (per API call)
+AFRICASTALKING_MAX_RECIPIENTS = 1000   # comma-separated 'to', same message
+BREVO_MAX_MESSAGE_VERSIONS = 1000      # messageVersions in one /smtp/email call
+
+
+# --- PROVIDER CLIENTS: keep-alive session + rate limit, one per provider per worker process ---
+class RateLimiter:
+    """Token bucket: at most 'rate' calls per second (bursts up to 'rate'), shared by all threads."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ProviderClient:
+    def __init__(self, name, rate_limit, pool_size):
+        self.name = name
+        self.limiter = RateLimiter(rate_limit)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def post(self, url, **kwargs):
+        self.limiter.acquire()
+        kwargs.setdefault('timeout', settings.NOTIFY_PROVIDER_TIMEOUT)
+        return self.session.post(url, **kwargs)
+
+
+_clients = {}
+_executor = None
+_router = None
+_clients_lock = threading.Lock()
+
+def get_client(name):
+    with _clients_lock:
+        if name not in _clients:
+            rate = settings.NOTIFY_RATE_LIMITS.get(name, 10)
+            _clients[name] = ProviderClient(name, rate, max(settings.NOTIFY_MAX_IN_FLIGHT, 1))
+        return _clients[name]
+
+def get_executor():
+    """Thread pool that keeps up to NOTIFY_MAX_IN_FLIGHT provider requests in flight."""
+    global _executor
+    with _clients_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(settings.NOTIFY_MAX_IN_FLIGHT, 1), thread_name_prefix='notify')
+        return _executor
+
+
+def get_router():
+    global _router
+    with _clients_lock:
+        if _router is None:
+            _router = SmsRouter({
+                'MOCK': NotificationService._send_mock,
+                'MOBITECH': NotificationService._send_mobitech,
+                # AT usually requires the '+'
+                'AFRICASTALKING': lambda phone, message: NotificationService._send_africastalking(f"+{phone}", message),
+            })
+        return _router
+
 
 class NotificationService:
     """
@@ -14,43 +98,89 @@ class NotificationService:
     Supports Mobitech (Primary), Africa's Talking (Backup), and Mock Mode.
     """
 
+    @staticmethod
+    def send_many(notifications):
+        """
+        Sends notification dicts concurrently ({'channel': 'sms', 'to', 'message'}
+        or {'channel': 'email', 'to', 'subject', 'html'}).
+        Returns [(note, success, exception or None)] in input order.
+        """
+        def send(note):
+            try:
+                if note['channel'] == 'sms':
+                    success = NotificationService.send_sms(note['to'], note['message'])
+                else:
+                    success = NotificationService.send_email(note['to'], note['subject'], note['html'])
+                return note, success, None
+            except Exception as exc:
+                return note, False, exc
+
+        if len(notifications) <= 1:
+            return [send(note) for note in notifications]
+        return list(get_executor().map(send, notifications))
+
     @staticmethod
     def send_sms(phone_number, message):
         """
-        Routes the SMS to the configured provider.
+        Routes the SMS to the healthiest provider, failing over on errors.
+        Raises NoProviderAvailable when every provider's circuit is open.
         """
         if not phone_number:
             logger.warning("NotificationService: No phone number provided.")
             return False
             
+        clean_phone = NotificationService.normalize_phone(phone_number)
+        return get_router().send(clean_phone, message)
+
+    @staticmethod
+    def _send_mock(phone, message):
+        # MOCK MODE (Free Dev)
+        print(f"\n📱 [MOCK SMS] --------------------------------")
+        print(f"To: {phone}")
+        print(f"Message: {message}")
+        print(f"----------------------------------------------\n")
+        return True
+
+    @staticmethod
+    def normalize_phone(phone_number):
         # Normalize phone to 2547... format
         # Mobitech and AT both prefer international format without the plus for some endpoints,
         # or with it. Standardizing to '2547...' is safest for local APIs often.
-        clean_phone = phone_number
-        if clean_phone.startswith('0'):
-            clean_phone = '254' + clean_phone[1:]
-        elif clean_phone.startswith('+'):
-            clean_phone = clean_phone[1:]
-        
-        # 1. MOCK MODE (Free Dev)
-        if SMS_PROVIDER == 'MOCK':
-            print(f"\n📱 [MOCK SMS] --------------------------------")
-            print(f"To: {clean_phone}")
-            print(f"Message: {message}")
-            print(f"----------------------------------------------\n")
-            return True
+        if phone_number.startswith('0'):
+            return '254' + phone_number[1:]
+        if phone_number.startswith('+'):
+            return phone_number[1:]
+        return phone_number
 
-        # 2. MOBITECH (Your Primary Choice)
-        elif SMS_PROVIDER == 'MOBITECH':
-            return NotificationService._send_mobitech(clean_phone, message)
+    @staticmethod
+    def send_sms_bulk(phone_numbers, message):
+        """
+        One message to many recipients, in as few provider calls as the provider allows.
+        Returns {phone_number: success}.
+        """
+        results = {phone: False for phone in phone_numbers}
+        clean = {}
+        for phone in phone_numbers:
+            if phone:
+                clean[NotificationService.normalize_phone(phone)] = phone
 
-        # 3. AFRICA'S TALKING (Backup Option)
-        elif SMS_PROVIDER == 'AFRICASTALKING':
-            # AT usually requires the '+'
-            return NotificationService._send_africastalking(f"+{clean_phone}", message)
+        router = get_router()
+        if router.preferred() == 'AFRICASTALKING':
+            numbers = list(clean)
+            for i in range(0, len(numbers), AFRICASTALKING_MAX_RECIPIENTS):
+                chunk = numbers[i:i + AFRICASTALKING_MAX_RECIPIENTS]
+                started = time.monotonic()
+                accepted = NotificationService._send_africastalking_bulk([f"+{n}" for n in chunk], message)
+                router.record('AFRICASTALKING', bool(accepted), (time.monotonic() - started) * 1000)
+                for number in chunk:
+                    results[clean[number]] = f"+{number}" in accepted
+            return results
 
-        logger.error(f"Unknown SMS_PROVIDER: {SMS_PROVIDER}")
-        return False
+        # Mobitech (single-recipient API) and Mock: one pooled, routed request per recipient
+        notes = [{'channel': 'sms', 'to': phone, 'message': message} for phone in clean.values()]
+        for note, success, exc in NotificationService.send_many(notes):
+            results[note['to']] = success
+        return results
 
     @staticmethod
     def _send_mobitech(phone, message):
@@ -74,7 +204,7 @@ class NotificationService:
         }
         
         try:
-            res = requests.post(url, json=payload, headers=headers, timeout=10)
+            res = get_client('MOBITECH').post(url, json=payload, headers=headers)
             res.raise_for_status()
             
             # Mobitech returns a list of dicts: [{"status_code":"1000",...}]
@@ -117,7 +247,7 @@ class NotificationService:
             "message": message
         }
         try:
-            res = requests.post(url, headers=headers, data=data, timeout=10)
+            res = get_client('AFRICASTALKING').post(url, headers=headers, data=data)
             res.raise_for_status()
             logger.info(f"AT SMS sent to {phone}")
             return True
@@ -125,6 +255,35 @@ class NotificationService:
             logger.error(f"AT SMS Failed: {e}")
             return False
 
+    @staticmethod
+    def _send_africastalking_bulk(phones, message):
+        """
+        One Africa's Talking call for up to AFRICASTALKING_MAX_RECIPIENTS numbers.
+        Returns the set of numbers the gateway accepted (per-recipient status).
+        """
+        url = "https://api.africastalking.com/version1/messaging"
+        headers = {
+            "ApiKey": getattr(settings, 'AFRICASTALKING_API_KEY', ''),
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json"
+        }
+        data = {
+            "username": getattr(settings, 'AFRICASTALKING_USERNAME', 'sandbox'),
+            "to": ",".join(phones),
+            "message": message
+        }
+        try:
+            res = get_client('AFRICASTALKING').post(url, headers=headers, data=data)
+            res.raise_for_status()
+            recipients = res.json().get('SMSMessageData', {}).get('Recipients', [])
+            # 100 Processed, 101 Sent, 102 Queued
+            accepted = {r.get('number') for r in recipients if r.get('statusCode') in (100, 101, 102)}
+            logger.info(f"AT bulk SMS: {len(accepted)}/{len(phones)} accepted")
+            return accepted
+        except Exception as e:
+            logger.error(f"AT Bulk SMS Failed: {e}")
+            return set()
+
     @staticmethod
     def send_email(to_email, subject, html_content, text_content=None):
         # 1. MOCK MODE (Dev) 
@@ -156,9 +315,55 @@ class NotificationService:
             payload['textContent'] = text_content
 
         try:
-            res = requests.post(url, headers=headers, json=payload, timeout=10)
+            res = get_client('BREVO').post(url, headers=headers, json=payload)
             res.raise_for_status()
             return True
         except Exception as e:
             logger.error(f"Email Failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    @staticmethod
+    def send_email_bulk(messages):
+        """
+        messages: [{'to', 'subject', 'html'}]. One Brevo call per BREVO_MAX_MESSAGE_VERSIONS
+        messages (each its own messageVersion). Returns [success] in input order.
+        """
+        if settings.DEBUG:
+            return [NotificationService.send_email(m['to'], m['subject'], m['html']) for m in messages]
+
+        results = [False] * len(messages)
+        valid = [i for i, m in enumerate(messages) if m['to']]
+
+        url = "https://api.brevo.com/v3/smtp/email"
+        headers = {
+            "accept": "application/json",
+            "api-key": getattr(settings, 'BREVO_API_KEY', ''),
+            "content-type": "application/json"
+        }
+
+        for start in range(0, len(valid), BREVO_MAX_MESSAGE_VERSIONS):
+            chunk = valid[start:start + BREVO_MAX_MESSAGE_VERSIONS]
+            first = messages[chunk[0]]
+            payload = {
+                "sender": {"name": "Yadi Wallet", "email": "no-reply@yadi.app"},
+                "subject": first['subject'],
+                "htmlContent": first['html'],
+                "messageVersions": [
+                    {
+                        "to": [{"email": messages[i]['to']}],
+                        "subject": messages[i]['subject'],
+                        "htmlContent": messages[i]['html']
+                    }
+                    for i in chunk
+                ]
+            }
+            try:
+                res = get_client('BREVO').post(url, headers=headers, json=payload)
+                res.raise_for_status()
+                for i in chunk:
+                    results[i] = True
+            except Exception as e:
+                # Brevo accepts or rejects the whole call
+                logger.error(f"Bulk Email Failed ({len(chunk)} messages): {e}")
+
+        return results
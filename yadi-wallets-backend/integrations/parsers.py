@@ -0,0 +1,23 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON: one object per line.
+    Used by bulk endpoints so the caller can stream large payloads.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except ValueError as e:
+                raise ParseError(f"NDJSON parse error on line {line_no}: {e}")
+        return items
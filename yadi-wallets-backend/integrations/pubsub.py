@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Cross-node cache invalidation. Every process runs one daemon listener on
+# "invalidate:*" and dispatches each message to the handlers of its topic.
+PREFIX = "invalidate:"
+
+_handlers = {}  # topic -> [callback(message or None)]
+_listener_pid = None
+_lock = threading.Lock()
+
+
+def subscribe(topic, callback):
+    """
+    Registers 'callback' for a topic (call at import time). It receives the
+    published message, or None after a (re)connect, when messages may have
+    been missed and the caller should drop everything it caches.
+    """
+    with _lock:
+        _handlers.setdefault(topic, []).append(callback)
+
+
+def publish(topic, message='*'):
+    """Fans a message out to every process. Returns False if Redis refused it."""
+    try:
+        redis.Redis.from_url(settings.REDIS_URL).publish(f"{PREFIX}{topic}", message)
+        return True
+    except redis.RedisError as e:
+        logger.error(f"Invalidation '{topic}' not published: {e}")
+        return False
+
+
+def ensure_listener():
+    """Starts this process's listener thread (again after a fork). Cheap to call on every lookup."""
+    global _listener_pid
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    threading.Thread(target=_listen, name='invalidation-listener', daemon=True).start()
+
+
+def _dispatch(topic, message):
+    for callback in list(_handlers.get(topic, [])):
+        try:
+            callback(message)
+        except Exception as e:
+            logger.error(f"Invalidation handler for '{topic}' failed: {e}")
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True).pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(f"{PREFIX}*")
+            # Anything published while we were not subscribed is lost: start fresh
+            for topic in list(_handlers):
+                _dispatch(topic, None)
+            for item in pubsub.listen():
+                _dispatch(item['channel'][len(PREFIX):], item['data'])
+        except Exception as e:
+            logger.warning(f"Invalidation listener disconnected, retrying: {e}")
+            time.sleep(10)
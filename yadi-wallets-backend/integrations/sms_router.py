@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class NoProviderAvailable(Exception):
+    """Every SMS provider's circuit is open. Raised so the calling task retries later."""
+
+
+class ProviderHealth:
+    """
+    Circuit breaker for one provider, fed by the outcome of every call.
+    CLOSED: in rotation. OPEN: skipped until the cooldown passes.
+    HALF_OPEN: exactly one probe call decides between CLOSED and OPEN again.
+    A call counts as bad if it failed or took longer than SMS_ROUTER_SLOW_CALL_MS.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'CLOSED', 'OPEN', 'HALF_OPEN'
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = deque(maxlen=settings.SMS_ROUTER_WINDOW)  # (ok, latency_ms)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def error_rate(self):
+        if not self.calls:
+            return 0.0
+        slow = settings.SMS_ROUTER_SLOW_CALL_MS
+        return sum(1 for ok, latency in self.calls if not ok or latency > slow) / len(self.calls)
+
+    def p95(self):
+        if not self.calls:
+            return 0.0
+        latencies = sorted(latency for _, latency in self.calls)
+        return latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+
+    def acquire(self):
+        """True if a call may go to this provider now (claims the probe when half-open)."""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= settings.SMS_ROUTER_COOLDOWN_SECONDS:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, ok, latency_ms):
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.probing = False
+                if ok and latency_ms <= settings.SMS_ROUTER_SLOW_CALL_MS:
+                    self.calls.clear()
+                    self._transition(self.CLOSED)
+                else:
+                    self._transition(self.OPEN)
+                return
+
+            self.calls.append((ok, latency_ms))
+            if (self.state == self.CLOSED and len(self.calls) >= settings.SMS_ROUTER_MIN_CALLS
+                    and self.error_rate() >= settings.SMS_ROUTER_ERROR_THRESHOLD):
+                self._transition(self.OPEN)
+
+    def _transition(self, state):
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        if state != self.state:
+            logger.warning(f"SMS provider {self.name}: circuit {self.state} -> {state} "
+                           f"(error rate {self.error_rate():.0%}, p95 {self.p95():.0f}ms)")
+        self.state = state
+
+    def snapshot(self):
+        return {
+            'state': self.state,
+            'calls': len(self.calls),
+            'error_rate': round(self.error_rate(), 3),
+            'p95_ms': round(self.p95(), 1),
+        }
+
+
+class SmsRouter:
+    """
+    Picks the SMS provider per message: healthy providers in SMS_PROVIDERS order,
+    except that ones whose p95 is over SMS_ROUTER_LATENCY_BUDGET_MS go to the back.
+    A failed send falls through to the next provider.
+    One router per worker process, so circuit state and p95 are process-local;
+    call and error counts are added to shared cache counters (see publish).
+    """
+
+    def __init__(self, senders, providers=None):
+        self.senders = senders  # {name: callable(phone, message) -> bool}
+        self.providers = [p for p in (providers or settings.SMS_PROVIDERS) if p in senders]
+        self.health = {name: ProviderHealth(name) for name in self.providers}
+        self.published_at = 0.0
+        self.unpublished = {name: {'calls': 0, 'errors': 0} for name in self.providers}
+
+    def candidates(self):
+        budget = settings.SMS_ROUTER_LATENCY_BUDGET_MS
+
+        def rank(item):
+            index, name = item
+            p95 = self.health[name].p95()
+            return (p95 > budget, p95 if p95 > budget else index)
+
+        return [name for _, name in sorted(enumerate(self.providers), key=rank)]
+
+    def preferred(self):
+        """The provider send() would try first right now (None if every circuit is open)."""
+        cooldown = settings.SMS_ROUTER_COOLDOWN_SECONDS
+        for name in self.candidates():
+            health = self.health[name]
+            if health.state != ProviderHealth.OPEN or time.monotonic() - health.opened_at >= cooldown:
+                return name
+        return None
+
+    def send(self, phone, message):
+        """Sends via the best available provider. Raises NoProviderAvailable if none could take it."""
+        tried = False
+        for name in self.candidates():
+            health = self.health[name]
+            if not health.acquire():
+                continue
+            tried = True
+            started = time.monotonic()
+            try:
+                ok = bool(self.senders[name](phone, message))
+            except Exception as e:
+                logger.error(f"SMS provider {name} raised: {e}")
+                ok = False
+            self.record(name, ok, (time.monotonic() - started) * 1000)
+            if ok:
+                return True
+
+        if not tried:
+            raise NoProviderAvailable(f"All SMS providers unavailable: {self.snapshot()}")
+        return False
+
+    def record(self, name, ok, latency_ms):
+        health = self.health[name]
+        before = health.state
+        health.record(ok, latency_ms)
+        self.unpublished[name]['calls'] += 1
+        if not ok:
+            self.unpublished[name]['errors'] += 1
+        self.publish(force=health.state != before)
+
+    def snapshot(self):
+        return {name: health.snapshot() for name, health in self.health.items()}
+
+    def publish(self, force=False):
+        """
+        At most every 10s unless forced: adds this process's new call/error counts
+        to the shared counters (cache.incr, so every worker's calls add up) and
+        writes its circuit snapshot, which the last worker to publish overwrites.
+        """
+        now = time.monotonic()
+        if not force and now - self.published_at < 10:
+            return
+        self.published_at = now
+        try:
+            for name, counts in self.unpublished.items():
+                for counter, value in counts.items():
+                    if value:
+                        key = f"sms_router:{name}:{counter}"
+                        cache.add(key, 0, timeout=None)
+                        cache.incr(key, value)
+                        counts[counter] = 0
+            cache.set_many({f"sms_router:{name}": state for name, state in self.snapshot().items()}, timeout=300)
+        except Exception as e:
+            logger.warning(f"SMS router metrics not published: {e}")
+
+
+def get_metrics(providers=None):
+    """
+    Per provider: 'calls' and 'errors' since the counters started, summed over
+    all workers, and 'circuit', the snapshot of the worker that published last
+    (process-local state; None without recent traffic).
+    """
+    providers = providers or settings.SMS_PROVIDERS
+    keys = [f"sms_router:{name}{suffix}" for name in providers for suffix in ('', ':calls', ':errors')]
+    values = cache.get_many(keys)
+    return {
+        name: {
+            'calls': values.get(f"sms_router:{name}:calls", 0),
+            'errors': values.get(f"sms_router:{name}:errors", 0),
+            'circuit': values.get(f"sms_router:{name}"),
+        }
+        for name in providers
+    }
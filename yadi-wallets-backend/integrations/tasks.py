@@ -1,6 +1,10 @@
 from celery import shared_task
+from django.conf import settings
 from .notifications import NotificationService
+from .webhooks import WebhookDispatcher
+from . import batching, digest
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -35,4 +39,117 @@ def send_email_task(self, to_email, subject, html_content):
         return "Sent"
     except Exception as exc:
         logger.error(f"Email Task Exception: {exc}")
-        raise self.retry(exc=exc)
\ No newline at end of file
+        raise self.retry(exc=exc)
+
+@shared_task
+def send_notifications_task(notifications):
+    """
+    Grouped notifications for one ledger posting, published after commit.
+    Items: {'channel': 'sms', 'to', 'message'} or {'channel': 'email', 'to', 'subject', 'html'},
+    sent concurrently over the worker's pooled provider clients.
+    An item that crashes is handed to the single-message task, which owns retries.
+    """
+    sent = 0
+    for note, success, exc in NotificationService.send_many(notifications):
+        if exc is not None:
+            logger.error(f"Notification Exception ({note['channel']} to {note['to']}): {exc}")
+            if note['channel'] == 'sms':
+                send_sms_task.delay(note['to'], note['message'])
+            else:
+                send_email_task.delay(note['to'], note['subject'], note['html'])
+        elif success:
+            sent += 1
+        else:
+            logger.warning(f"Notification reported failure ({note['channel']} to {note['to']})")
+
+    return f"Sent {sent}/{len(notifications)}"
+
+def publish_notifications(notifications):
+    """
+    Runs on commit of a ledger posting. Digest-mode credits go to the Redis
+    buffer; everything else joins the batch-send queue. Anything Redis refused
+    goes out as one grouped task instead.
+    """
+    instant = [note for note in notifications if 'digest' not in note]
+    buffered = [note for note in notifications if 'digest' in note]
+    if buffered:
+        leftovers, full_wallets = digest.buffer_credits(buffered)
+        instant.extend(leftovers)
+        if full_wallets:
+            flush_digests_task.delay(full_wallets)
+    if instant and not batching.enqueue(instant):
+        send_notifications_task.delay(instant)
+
+@shared_task(ignore_result=True)
+def drain_notification_queue_task():
+    """
+    Periodic (Celery beat): sends queued notifications as provider bulk calls.
+    Recipients that failed are handed to the single-message tasks, which own retries.
+    A batch is acknowledged only after that: if the worker dies first, a later
+    run requeues it (at-least-once). Time-boxed so runs don't pile up behind a slow provider.
+    """
+    size = settings.NOTIFY_BATCH_DRAIN_SIZE
+    deadline = time.monotonic() + 30
+    summary = {'sent': 0, 'retried': 0}
+    batching.recover()
+    while time.monotonic() < deadline:
+        notes = batching.drain(size)
+        try:
+            outcomes = batching.send_batch(notes)
+        except Exception:
+            batching.release() # The whole batch is sent again next run
+            raise
+        for note, success in outcomes:
+            if success:
+                summary['sent'] += 1
+                continue
+            summary['retried'] += 1
+            if note['channel'] == 'sms':
+                send_sms_task.delay(note['to'], note['message'])
+            else:
+                send_email_task.delay(note['to'], note['subject'], note['html'])
+        batching.ack()
+        if len(notes) < size:
+            break
+
+    if summary['sent'] or summary['retried']:
+        logger.info(f"Notification batch: {summary}")
+    return summary
+
+@shared_task
+def flush_digests_task(wallet_ids=None):
+    """
+    Sends one summary per buffered wallet. Periodic (Celery beat) with no
+    arguments: flushes every buffer that is old or big enough.
+    """
+    from finance.models import Wallet
+
+    if wallet_ids is None:
+        wallet_ids = digest.due_wallets()
+    taken = digest.take(wallet_ids)
+    if not taken:
+        return "Nothing to send"
+
+    # Current balance and label for every digest in one query
+    wallets = {
+        str(wallet_id): (label, balance)
+        for wallet_id, label, balance in Wallet.objects.filter(id__in=list(taken)).values_list('id', 'label', 'balance')
+    }
+    notes = [
+        digest.build_digest(state, *wallets[wallet_id])
+        for wallet_id, state in taken.items() if wallet_id in wallets
+    ]
+    if batching.enqueue(notes):
+        return f"Queued {len(notes)} digests"
+    return send_notifications_task(notes)
+
+@shared_task(ignore_result=True)
+def dispatch_webhooks_task():
+    """
+    Periodic (Celery beat): drains the webhook outbox.
+    Time-boxed so runs don't pile up behind a slow tickets service.
+    """
+    summary = WebhookDispatcher().drain(max_seconds=30)
+    if summary['claimed']:
+        logger.info(f"Webhook dispatch: {summary}")
+    return summary
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CollectPaymentView, GenerateMagicLinkView, OnboardUserView, ServiceBalanceView, ServiceHistoryView, ServiceWithdrawalView
+from .views import BulkCollectPaymentView, CollectPaymentView, GenerateMagicLinkView, OnboardUserView, ServiceBalanceView, ServiceHistoryView, ServiceStatementView, ServiceWithdrawalView
 
 
 
@@ -11,12 +11,14 @@ urlpatterns = [
     path('onboard/', OnboardUserView.as_view(), name='service-onboard'),
     path('balance/<uuid:remote_id>/', ServiceBalanceView.as_view()),
     path('payment/collect/', CollectPaymentView.as_view(), name='service-collect-payment'),
+    path('payment/collect/bulk/', BulkCollectPaymentView.as_view(), name='service-collect-payment-bulk'),
 
     path('withdraw/', ServiceWithdrawalView.as_view(), name='service-withdraw'),
 
     path('auth/link/', GenerateMagicLinkView.as_view(), name='service-magic-link'),
 
     path('history/<uuid:remote_id>/', ServiceHistoryView.as_view(), name='service-history'),
+    path('statement/<uuid:remote_id>/', ServiceStatementView.as_view(), name='service-statement'),
 ]
 
 
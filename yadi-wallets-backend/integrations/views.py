@@ -1,4 +1,3 @@
-import requests
 import uuid
 from decimal import Decimal
 from rest_framework.views import APIView
@@ -8,54 +7,47 @@ from django.db import transaction
 from django.db.models import Sum
 
 from users.models import User
-from finance.models import Wallet, Currency, LedgerEntry, Transaction
-from finance.services import LedgerService
+from finance.models import Wallet, LedgerEntry, Transaction
+from finance.services import LedgerService, CommissionService, PostingMode, InsufficientFundsError
+from finance import registry
+from finance.pagination import KeysetPagination
+from finance import history, statements
+from config.renderers import CSVRenderer, NDJSONRenderer, ORJSONParser
+from .parsers import NDJSONParser
 from django.core.signing import TimestampSigner
-import hmac
-import hashlib
-import json
-from django.conf import settings
-
-# --- HELPER: Webhook Sender ---
-import hmac
-import hashlib
-import json
-import requests
-from decouple import config
-
-from django.core.paginator import Paginator
-
-def send_webhook_notification(reference, status):
-    base_url = config('TICKETS_SERVICE_URL', default="http://localhost:8000")
-    webhook_url = f"{base_url}/api/webhooks/payment/"
-    
-    # 1. Prepare the payload
-    payload = {"reference": reference, "status": status}
-    
-    # 2. Convert to JSON bytes
-    payload_bytes = json.dumps(payload, separators=(',', ':')).encode('utf-8')
-    
-    # 3. Generate Signature
-    secret = config('WEBHOOK_SECRET').encode('utf-8')
-    signature = hmac.new(secret, payload_bytes, hashlib.sha256).hexdigest()
-    
-    headers = {
-        'Content-Type': 'application/json',
-        'X-Yadi-Signature': signature  
-    }
-    
-    try:
-        print(f"📣 Sending Secured Webhook for {reference}...")
-        requests.post(webhook_url, data=payload_bytes, headers=headers, timeout=20)
-        print(f"✅ Webhook delivered.")
-    except Exception as e:
-        print(f"❌ Webhook failed: {e}")
+
+
+# --- HELPER: Webhook Outbox ---
+# Webhooks are no longer sent inline. enqueue_webhook() writes an outbox row in
+# the caller's DB transaction; the dispatcher task (integrations.webhooks) delivers it.
+from .webhooks import enqueue_webhook
+from .authentication import ServiceKeyAuthentication, IsServiceClient
+
+
+# --- BASE: Server-to-Server Auth ---
+class ServiceAPIView(APIView):
+    """Base for every /api/service/ endpoint: callers must send a valid X-Service-Key."""
+    authentication_classes = [ServiceKeyAuthentication]
+    permission_classes = [IsServiceClient]
+
+
+# --- HELPER: Ticket Sale Split ---
+def build_ticket_sale_entries(master_wallet, revenue_wallet, plan, total_amount):
+    # Organizer's split plan: their commission rate, no DB hit when cached
+    fee, net_amount = CommissionService.split(plan, total_amount)
+    org_wallet = CommissionService.net_wallet(plan)
+
+    return [
+        {'wallet': master_wallet, 'amount': total_amount, 'type': 'DEBIT'}, # Cash In Bank (Liability)
+        {'wallet': org_wallet, 'amount': net_amount, 'type': 'CREDIT'},     # Liability to Org
+        {'wallet': revenue_wallet, 'amount': fee, 'type': 'CREDIT'},        # Liability to Self
+    ]
 
 
 # --- VIEW 1: User Onboarding (The Handshake) ---
 # yadi-wallets/integrations/views.py
 
-class OnboardUserView(APIView):
+class OnboardUserView(ServiceAPIView):
     """
     Called by Yadi Tickets. 
     Handles 'Smart Merging' of existing customers into Organizers.
@@ -98,7 +90,7 @@ class OnboardUserView(APIView):
 
                 # 4. Ensure Organizer Wallet Exists
                 # (They might already have a Customer wallet, but they NEED an Organizer one now)
-                currency, _ = Currency.objects.get_or_create(code='KES')
+                currency = registry.currency('KES')
                 
                 wallet, created = Wallet.objects.get_or_create(
                     owner=user,
@@ -119,7 +111,7 @@ class OnboardUserView(APIView):
 
 
 # --- VIEW 2: Balance Check (The Dashboard Proxy) ---
-class ServiceBalanceView(APIView):
+class ServiceBalanceView(ServiceAPIView):
     """
     GET /api/service/balance/{remote_user_id}/
     """
@@ -152,7 +144,7 @@ class ServiceBalanceView(APIView):
 
 
 # --- VIEW 3: Payment Collection (The Money Flow) ---
-class CollectPaymentView(APIView):
+class CollectPaymentView(ServiceAPIView):
     """
     POST /api/service/payment/collect/
     Trigger M-Pesa STK Push and credit the organizer.
@@ -171,24 +163,17 @@ class CollectPaymentView(APIView):
             mpesa_receipt = f"MPESA-{uuid.uuid4().hex[:8].upper()}"
 
             with transaction.atomic():
-                # 1. Identify Wallets
-                org_user = User.objects.get(remote_ticket_user_id=organizer_remote_id)
-                org_wallet = Wallet.objects.get(owner=org_user, wallet_type=Wallet.Type.ORGANIZER)
+                # 1. Identify Wallets (organizer via their cached split plan)
+                plan = CommissionService.get_plan(organizer_remote_id)
                 
-                master_wallet = Wallet.objects.get(wallet_type=Wallet.Type.MASTER_LIQUIDITY)
-                revenue_wallet = Wallet.objects.get(wallet_type=Wallet.Type.REVENUE)
+                master_wallet = Wallet.objects.system_wallet(Wallet.Type.MASTER_LIQUIDITY, ticket_ref)
+                revenue_wallet = Wallet.objects.system_wallet(Wallet.Type.REVENUE, ticket_ref)
 
                 # 2. Calculate Split
                 total_amount = Decimal(str(amount))
-                fee = total_amount * Decimal('0.04')
-                net_amount = total_amount - fee
 
                 # 3. Write to Ledger (Money In)
-                entries = [
-                    {'wallet': master_wallet, 'amount': total_amount, 'type': 'DEBIT'}, # Cash In Bank (Liability)
-                    {'wallet': org_wallet, 'amount': net_amount, 'type': 'CREDIT'},     # Liability to Org
-                    {'wallet': revenue_wallet, 'amount': fee, 'type': 'CREDIT'},        # Liability to Self
-                ]
+                entries = build_ticket_sale_entries(master_wallet, revenue_wallet, plan, total_amount)
 
                 LedgerService.process_transaction(
                     reference=ticket_ref,
@@ -197,11 +182,11 @@ class CollectPaymentView(APIView):
                     entries=entries
                 )
 
-            # --- WEBHOOK TRIGGER ---
-            # We call this AFTER the 'with transaction.atomic()' block closes.
-            # This ensures we don't notify the Ticket App if the DB save failed.
-            send_webhook_notification(ticket_ref, 'COMPLETED')
-            # -----------------------
+                # --- WEBHOOK TRIGGER ---
+                # Queued in the SAME transaction as the ledger write: if the DB
+                # save fails, the Ticket App is never notified.
+                enqueue_webhook([{"reference": ticket_ref, "status": "COMPLETED"}])
+                # -----------------------
 
             return Response({"status": "success", "mpesa_ref": mpesa_receipt})
 
@@ -211,8 +196,136 @@ class CollectPaymentView(APIView):
         
 
 
+# --- VIEW 3b: Bulk Payment Collection (End-of-Event Settlement) ---
+class BulkCollectPaymentView(ServiceAPIView):
+    """
+    POST /api/service/payment/collect/bulk/
+    Body: JSON list (or {"items": [...]}) or NDJSON, one sale per item:
+        {"phone": "...", "amount": "500", "reference": "TICKET-1", "organizer_id": "uuid"}
+    Posts in chunks (one DB transaction each) and returns a status per reference.
+    """
+    parser_classes = [ORJSONParser, NDJSONParser]
+    chunk_size = 500
+    max_items = 20000
+    # Largest sale the amount columns hold (same bound as the fee quote)
+    max_amount = Decimal('99999999.99')
+
+    def post(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list of sales"}, status=400)
+        if len(items) > self.max_items:
+            return Response({"error": f"Too many items (Max {self.max_items})"}, status=413)
+
+        results = []
+        sales = []
+        seen = set()
+
+        def fail(reference, error):
+            results.append({"reference": reference, "status": "FAILED", "error": error})
+
+        # 1. Validate the shape of every item
+        for item in items:
+            if not isinstance(item, dict):
+                fail(None, "Invalid item")
+                continue
+            ticket_ref = item.get('reference')
+            # Scalars only (a list or object is not a reference, and cannot be de-duplicated)
+            if ticket_ref is not None and (isinstance(ticket_ref, bool) or not isinstance(ticket_ref, (str, int))):
+                fail(None, "Invalid reference")
+                continue
+            if isinstance(ticket_ref, int):
+                ticket_ref = str(ticket_ref) # Stored as text: 7 and "7" are the same reference
+            if not all([item.get('phone'), item.get('amount'), ticket_ref, item.get('organizer_id')]):
+                fail(ticket_ref, "Missing data")
+                continue
+            if ticket_ref in seen:
+                fail(ticket_ref, "Duplicate reference")
+                continue
+            try:
+                total_amount = Decimal(str(item['amount']))
+                organizer_id = uuid.UUID(str(item['organizer_id']))
+                # Whole cents, at least 0.01 and within the column (NaN/Infinity fail is_finite)
+                valid = total_amount.is_finite() and Decimal('0.01') <= total_amount <= self.max_amount
+                if valid:
+                    total_amount = total_amount.quantize(Decimal('0.01'))
+            except (ArithmeticError, ValueError):
+                fail(ticket_ref, "Invalid amount or organizer_id")
+                continue
+            if not valid:
+                fail(ticket_ref, "Invalid amount")
+                continue
+            seen.add(ticket_ref)
+            sales.append((ticket_ref, total_amount, organizer_id))
+
+        # 2. Resolve every organizer's split plan (and the system shards) in one go
+        plans = CommissionService.get_plans({organizer_id for _, _, organizer_id in sales})
+        master_shards = registry.system_shards(Wallet.Type.MASTER_LIQUIDITY)
+        revenue_shards = registry.system_shards(Wallet.Type.REVENUE)
+        if not master_shards or not revenue_shards:
+            return Response({"error": "System wallets not initialised"}, status=500)
+
+        batch = []
+        receipts = {}
+        for ticket_ref, total_amount, organizer_id in sales:
+            plan = plans.get(str(organizer_id))
+            if not plan:
+                fail(ticket_ref, "Organizer wallet not found")
+                continue
+
+            master_wallet = Wallet.objects.pick_shard(master_shards, ticket_ref)
+            revenue_wallet = Wallet.objects.pick_shard(revenue_shards, ticket_ref)
+            try:
+                entries = build_ticket_sale_entries(master_wallet, revenue_wallet, plan, total_amount)
+            except (ArithmeticError, ValueError, KeyError) as e:
+                # A plan the split cannot apply fails this sale only
+                fail(ticket_ref, f"Commission split failed: {e}")
+                continue
+            batch.append({
+                'reference': ticket_ref,
+                'description': f"Ticket Sale: {ticket_ref}",
+                'tx_type': Transaction.Type.TICKET_SALE,
+                'entries': entries,
+            })
+            receipts[ticket_ref] = f"MPESA-{uuid.uuid4().hex[:8].upper()}"
+
+        # 3. Post in chunks (one DB transaction per chunk)
+        completed = []
+        for start in range(0, len(batch), self.chunk_size):
+            chunk = batch[start:start + self.chunk_size]
+            try:
+                with transaction.atomic():
+                    outcomes = LedgerService.process_batch(chunk)
+
+                    # --- WEBHOOK TRIGGER (one outbox row per chunk, same transaction) ---
+                    enqueue_webhook([
+                        {"reference": outcome['reference'], "status": "COMPLETED"}
+                        for outcome in outcomes if outcome['ok']
+                    ])
+            except Exception as e:
+                print(f"Bulk Payment Error: {e}")
+                outcomes = [{'reference': item['reference'], 'ok': False, 'error': str(e)} for item in chunk]
+
+            for outcome in outcomes:
+                reference = outcome['reference']
+                if outcome['ok']:
+                    results.append({"reference": reference, "status": "COMPLETED", "mpesa_ref": receipts[reference]})
+                    completed.append(reference)
+                else:
+                    fail(reference, outcome['error'])
+
+        return Response({
+            "processed": len(results),
+            "succeeded": len(completed),
+            "failed": len(results) - len(completed),
+            "results": results
+        })
+
+
 # --- VIEW 4: Withdrawal Proxy (Money Out) ---
-class ServiceWithdrawalView(APIView):
+class ServiceWithdrawalView(ServiceAPIView):
     """
     POST /api/service/withdraw/
     Tickets App requests a withdrawal on behalf of an organizer.
@@ -252,7 +365,7 @@ class ServiceWithdrawalView(APIView):
 
             # 2. Define Transaction
             reference = f"WD-{uuid.uuid4().hex[:8].upper()}"
-            suspense_wallet = Wallet.objects.get(wallet_type=Wallet.Type.SUSPENSE)
+            suspense_wallet = Wallet.objects.system_wallet(Wallet.Type.SUSPENSE, reference)
 
             # 3. Atomic Ledger (Move from Organizer -> Suspense)
             with transaction.atomic():
@@ -265,7 +378,8 @@ class ServiceWithdrawalView(APIView):
                     reference=reference,
                     description=f"Withdrawal Request by {user.email}",
                     tx_type=Transaction.Type.WITHDRAWAL,
-                    entries=entries
+                    entries=entries,
+                    mode=PostingMode.ATOMIC
                 )
                 
                 # Lock it for Admin Approval
@@ -279,6 +393,8 @@ class ServiceWithdrawalView(APIView):
                 "new_balance": wallet.balance # Updated balance (post-deduction)
             })
 
+        except InsufficientFundsError:
+            return Response({"error": "Insufficient funds"}, status=400)
         except User.DoesNotExist:
             return Response({"error": "User wallet not found"}, status=404)
         except Exception as e:
@@ -288,7 +404,7 @@ class ServiceWithdrawalView(APIView):
 
 
 
-class GenerateMagicLinkView(APIView):
+class GenerateMagicLinkView(ServiceAPIView):
     """
     POST /api/service/auth/link/
     Generates a short-lived, signed URL for the frontend to consume.
@@ -324,51 +440,60 @@ class GenerateMagicLinkView(APIView):
 
 
 # --- VIEW 5: Transaction History Proxy ---
-class ServiceHistoryView(APIView):
+class ServiceHistoryView(ServiceAPIView):
     """
-    GET /api/service/history/{remote_id}/?page=1&page_size=10
+    GET /api/service/history/{remote_id}/?cursor=...&page_size=10[&count=true]
+    Keyset pages: pass back 'next_cursor' until it is null.
     """
     def get(self, request, remote_id):
         try:
             user = User.objects.get(remote_ticket_user_id=remote_id)
             wallet = Wallet.objects.get(owner=user, wallet_type=Wallet.Type.ORGANIZER)
             
-            # 1. Get ALL entries (Lazy QuerySet)
-            queryset = LedgerEntry.objects.filter(wallet=wallet).select_related('transaction').order_by('-created_at')
-            
-            # 2. Paginate
-            page_number = request.query_params.get('page', 1)
-            page_size = request.query_params.get('page_size', 10)
+            # 1. Get ALL entries (Lazy QuerySet, only the returned columns)
+            queryset = history.project(LedgerEntry.objects.filter(wallet=wallet), history.SERVICE_FIELDS)
             
-            paginator = Paginator(queryset, page_size)
-            page_obj = paginator.get_page(page_number)
+            # 2. Paginate (newest first, no COUNT or OFFSET)
+            paginator = KeysetPagination()
+            paginator.page_size = 10
+            page = paginator.paginate_queryset(queryset, request)
 
             # 3. Serialize
-            history = []
-            for entry in page_obj:
-                tx = entry.transaction
-                sign = 1 if entry.entry_type == LedgerEntry.EntryType.CREDIT else -1
-                
-                history.append({
-                    "id": str(tx.id),
-                    "type": tx.transaction_type,
-                    "amount": float(entry.amount) * sign,
-                    "status": tx.status,
-                    "reference": tx.reference,
-                    "date": entry.created_at.strftime("%Y-%m-%d %H:%M")
-                })
-
-            return Response({
-                "results": history,
-                "total_pages": paginator.num_pages,
-                "current_page": page_obj.number,
-                "has_next": page_obj.has_next(),
-                "has_previous": page_obj.has_previous()
-            })
+            body = {
+                "results": history.serialize(page, history.SERVICE_FIELDS),
+                "next_cursor": paginator.next_cursor,
+                "has_next": paginator.next_cursor is not None,
+            }
+            if paginator.count is not None:
+                body["count"] = paginator.count
+            return Response(body)
 
         except (User.DoesNotExist, Wallet.DoesNotExist):
             return Response({
                 "results": [], 
-                "total_pages": 1, 
-                "current_page": 1
-            }, status=200)
\ No newline at end of file
+                "next_cursor": None,
+                "has_next": False
+            }, status=200)
+
+
+# --- VIEW 6: Statement Export (Streamed) ---
+class ServiceStatementView(ServiceAPIView):
+    """
+    GET /api/service/statement/{remote_id}/?from=YYYY-MM-DD&to=YYYY-MM-DD&format=csv|ndjson
+    The organizer wallet's statement as one streamed download (see finance.statements).
+    """
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request, remote_id):
+        try:
+            start, end = statements.parse_period(request.query_params.get('from'), request.query_params.get('to'))
+        except statements.StatementError as e:
+            return Response({"error": str(e)}, status=400)
+
+        try:
+            wallet = Wallet.objects.get(owner__remote_ticket_user_id=remote_id, wallet_type=Wallet.Type.ORGANIZER)
+        except Wallet.DoesNotExist:
+            return Response({"error": "Organizer wallet not found"}, status=404)
+
+        return statements.statement_response(wallet, request.accepted_renderer.format, start, end)
+
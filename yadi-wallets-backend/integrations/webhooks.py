@@ -0,0 +1,263 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import WebhookOutbox
+
+logger = logging.getLogger(__name__)
+
+# How long a dispatcher owns the rows it claimed before another one may retry them
+CLAIM_LEASE = timedelta(seconds=120)
+
+
+def enqueue_webhook(events, endpoint=None):
+    """
+    Queues webhook events for the tickets service: a single INSERT.
+    Call it inside the same transaction.atomic() block as the ledger posting,
+    so a rolled-back payment never notifies anyone.
+    events: [{"reference": ..., "status": ...}, ...]
+    """
+    if not events:
+        return None
+    return WebhookOutbox.objects.create(
+        endpoint=endpoint or settings.TICKETS_SERVICE_URL,
+        events=events
+    )
+
+
+def sign_payload(payload_bytes):
+    secret = settings.WEBHOOK_SECRET.encode('utf-8')
+    return hmac.new(secret, payload_bytes, hashlib.sha256).hexdigest()
+
+
+def build_request(endpoint, events):
+    """
+    Single event -> the original {"reference", "status"} payload.
+    Several events -> {"events": [...]} to the batch route, one signature for all.
+    """
+    if len(events) == 1:
+        url = f"{endpoint}/api/webhooks/payment/"
+        payload = events[0]
+    else:
+        url = f"{endpoint}/api/webhooks/payment/batch/"
+        payload = {"events": events}
+
+    payload_bytes = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Yadi-Signature': sign_payload(payload_bytes)
+    }
+    return url, payload_bytes, headers
+
+
+# --- HTTP: one keep-alive session per worker process ---
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = max(settings.WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT, 1)
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+# --- METRICS (Django cache: shared across nodes when the cache is) ---
+METRIC_NAMES = ('requests', 'delivered', 'retried', 'failed', 'events', 'latency_ms')
+
+def record_metric(endpoint, name, value=1):
+    """Best effort: a cache outage is logged, it never fails a delivery cycle."""
+    key = f"webhooks:{endpoint}:{name}"
+    try:
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.set(key, value, timeout=None)
+    except Exception as e:
+        logger.warning(f"Webhook metric {name} not recorded: {e}")
+
+def get_metrics(endpoint=None):
+    endpoint = endpoint or settings.TICKETS_SERVICE_URL
+    return {name: cache.get(f"webhooks:{endpoint}:{name}", 0) for name in METRIC_NAMES}
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped."""
+    delay = min(settings.WEBHOOK_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), settings.WEBHOOK_RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class WebhookDispatcher:
+    """
+    Drains WebhookOutbox: claims due rows, packs each endpoint's events into
+    coalesced signed POSTs, delivers them over the pooled session (at most
+    WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT requests in flight per endpoint),
+    then records success or schedules a backoff retry.
+    """
+
+    def __init__(self, batch_size=200):
+        self.batch_size = batch_size
+        self.max_events = max(settings.WEBHOOK_BATCH_MAX_EVENTS, 1)
+        self.linger = timedelta(seconds=settings.WEBHOOK_BATCH_LINGER_SECONDS)
+
+    def claim(self):
+        """
+        Leases due rows so parallel dispatchers never send the same row twice.
+        An endpoint's rows are left alone (to fill up) until either a full batch
+        is waiting or the oldest one has lingered long enough.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                WebhookOutbox.objects.select_for_update(skip_locked=True)
+                .filter(status=WebhookOutbox.Status.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'id')[:self.batch_size]
+            )
+
+            by_endpoint = defaultdict(list)
+            for row in rows:
+                by_endpoint[row.endpoint].append(row)
+
+            ready = []
+            for endpoint_rows in by_endpoint.values():
+                waiting = sum(len(row.events) for row in endpoint_rows)
+                if waiting >= self.max_events or endpoint_rows[0].next_attempt_at <= now - self.linger:
+                    ready.extend(endpoint_rows)
+
+            if ready:
+                WebhookOutbox.objects.filter(id__in=[row.id for row in ready]).update(
+                    next_attempt_at=now + CLAIM_LEASE
+                )
+        return ready
+
+    def pack(self, rows):
+        """
+        Greedily packs one endpoint's rows into packets of <= max_events events.
+        A row is never split: its status tracks its whole event list.
+        """
+        packets = []
+        current, size = [], 0
+        for row in rows:
+            if current and size + len(row.events) > self.max_events:
+                packets.append(current)
+                current, size = [], 0
+            current.append(row)
+            size += len(row.events)
+        if current:
+            packets.append(current)
+        return packets
+
+    def deliver(self, endpoint, rows):
+        """One signed POST for every event in 'rows'. Returns (rows, error); error is None on success."""
+        if not settings.WEBHOOK_SECRET:
+            return rows, "WEBHOOK_SECRET is not configured"
+
+        events = [event for row in rows for event in row.events]
+        url, payload_bytes, headers = build_request(endpoint, events)
+        started = time.monotonic()
+        try:
+            res = get_session().post(url, data=payload_bytes, headers=headers, timeout=settings.WEBHOOK_TIMEOUT)
+            res.raise_for_status()
+            return rows, None
+        except requests.exceptions.RequestException as e:
+            return rows, str(e)
+        finally:
+            record_metric(endpoint, 'requests')
+            record_metric(endpoint, 'latency_ms', int((time.monotonic() - started) * 1000))
+
+    def run_once(self):
+        """One claim + deliver cycle. Returns a summary dict."""
+        rows = self.claim()
+        summary = {'claimed': len(rows), 'requests': 0, 'delivered': 0, 'retried': 0, 'failed': 0}
+        if not rows:
+            return summary
+
+        by_endpoint = defaultdict(list)
+        for row in rows:
+            by_endpoint[row.endpoint].append(row)
+
+        # One bounded pool per endpoint = per-endpoint concurrency limit
+        limit = max(settings.WEBHOOK_MAX_CONCURRENCY_PER_ENDPOINT, 1)
+        pools = []
+        futures = []
+        for endpoint, endpoint_rows in by_endpoint.items():
+            packets = self.pack(endpoint_rows)
+            pool = ThreadPoolExecutor(max_workers=min(limit, len(packets)))
+            pools.append(pool)
+            futures.extend(pool.submit(self.deliver, endpoint, packet) for packet in packets)
+        outcomes = [future.result() for future in futures]
+        for pool in pools:
+            pool.shutdown()
+        summary['requests'] = len(outcomes)
+
+        now = timezone.now()
+        delivered_ids = []
+        retry_rows = []
+        metrics = [] # (endpoint, name, value), recorded once the outcomes are saved
+        for packet, error in outcomes:
+            if error is None:
+                for row in packet:
+                    delivered_ids.append(row.id)
+                    metrics.append((row.endpoint, 'delivered', 1))
+                    metrics.append((row.endpoint, 'events', len(row.events)))
+                summary['delivered'] += len(packet)
+                continue
+
+            for row in packet:
+                row.attempts += 1
+                row.last_error = error[:1000]
+                if row.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                    row.status = WebhookOutbox.Status.FAILED
+                    summary['failed'] += 1
+                    metrics.append((row.endpoint, 'failed', 1))
+                    logger.error(f"Webhook {row.id} gave up after {row.attempts} attempts: {error}")
+                else:
+                    row.next_attempt_at = now + retry_delay(row.attempts)
+                    summary['retried'] += 1
+                    metrics.append((row.endpoint, 'retried', 1))
+                    logger.warning(f"Webhook {row.id} failed (attempt {row.attempts}), retrying: {error}")
+                retry_rows.append(row)
+
+        if delivered_ids:
+            WebhookOutbox.objects.filter(id__in=delivered_ids).update(
+                status=WebhookOutbox.Status.DELIVERED, delivered_at=now, last_error=None
+            )
+        if retry_rows:
+            WebhookOutbox.objects.bulk_update(retry_rows, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+        for endpoint, name, value in metrics:
+            record_metric(endpoint, name, value)
+        return summary
+
+    def drain(self, max_seconds=None):
+        """Runs cycles until nothing is due (or the time budget is spent)."""
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        totals = {'claimed': 0, 'requests': 0, 'delivered': 0, 'retried': 0, 'failed': 0}
+        while True:
+            summary = self.run_once()
+            for key in totals:
+                totals[key] += summary[key]
+            if summary['claimed'] < self.batch_size:
+                break
+            if deadline and time.monotonic() > deadline:
+                break
+        return totals
@@ -1,6 +1,7 @@
 from allauth.socialaccount.adapter import DefaultSocialAccountAdapter
 from users.models import User
-from finance.models import Wallet, Currency
+from finance.models import Wallet
+from finance import registry
 
 class WalletSocialAdapter(DefaultSocialAccountAdapter):
     def save_user(self, request, sociallogin, form=None):
@@ -8,7 +9,7 @@ class WalletSocialAdapter(DefaultSocialAccountAdapter):
         user = super().save_user(request, sociallogin, form)
         
         # 2. Check Wallets
-        currency, _ = Currency.objects.get_or_create(code='KES', defaults={'name': 'Shilling', 'symbol': 'KSh'})
+        currency = registry.currency('KES', defaults={'name': 'Shilling', 'symbol': 'KSh'})
         
         # If they already have an ORGANIZER wallet (from Ticket App handshake), 
         # we DO NOT create a Customer wallet automatically (optional choice).
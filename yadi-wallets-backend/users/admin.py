@@ -2,14 +2,21 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from .models import User
+from finance.services import CommissionService
+from .authentication import bump_token_versions
+
+# Changing any of these makes the user's issued JWTs stale (see users.authentication)
+TOKEN_FIELDS = {'is_kyc_verified', 'is_active', 'is_staff', 'is_superuser', 'password'}
 
 @admin.action(description='✅ Approve KYC for Selected Users')
 def approve_kyc(modeladmin, request, queryset):
     queryset.update(is_kyc_verified=True, kyc_rejection_reason=None)
+    bump_token_versions(queryset)
 
 @admin.action(description='🚫 Reject KYC (Reset)')
 def reject_kyc(modeladmin, request, queryset):
     queryset.update(is_kyc_verified=False, kyc_rejection_reason="Documents unclear. Please re-upload.")
+    bump_token_versions(queryset)
 
 class UserAdmin(BaseUserAdmin):
     # Columns to show in the list view
@@ -38,6 +45,14 @@ class UserAdmin(BaseUserAdmin):
         ('Important Dates', {'fields': ('last_login', 'date_joined')}),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Ticket sales use a cached split plan: drop it so the new rate applies
+        if change and 'commission_rate' in form.changed_data:
+            CommissionService.invalidate(obj)
+        if change and TOKEN_FIELDS & set(form.changed_data):
+            bump_token_versions(obj)
+
     def id_preview(self, obj):
         if obj.id_front_image:
             return format_html('<a href="{}" target="_blank">View ID</a>', obj.id_front_image.url)
@@ -0,0 +1,103 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# JWT claims (on top of simplejwt's user_id) that let finance views run without loading the user row
+KYC_CLAIM = "kyc"
+VERSION_CLAIM = "tv"
+USERNAME_CLAIM = "username"
+
+# Current User.token_version, shared by all processes (avoids the DB on every request)
+VERSION_KEY = "users:token_version:{}"
+
+
+class WalletTokenClaimsSerializer(TokenObtainPairSerializer):
+    """Used by dj-rest-auth (JWT_TOKEN_CLAIMS_SERIALIZER) whenever it issues tokens at login."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[KYC_CLAIM] = user.is_kyc_verified
+        token[VERSION_CLAIM] = user.token_version
+        token[USERNAME_CLAIM] = user.username
+        return token
+
+
+def _cache_versions(versions):
+    """versions: {user_id: token_version}"""
+    try:
+        cache.set_many(
+            {VERSION_KEY.format(user_id): version for user_id, version in versions.items()},
+            timeout=int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()),
+        )
+    except Exception as e:
+        logger.error(f"Token versions not cached: {e}")
+
+
+def bump_token_versions(users):
+    """
+    Makes every token issued so far for these users stale (a queryset, or a
+    single User whose token_version is updated in place): their claims no
+    longer count and requests carrying them re-check the DB.
+    Call after changing anything the claims carry (KYC flag) or revoking access.
+    """
+    single = users if isinstance(users, User) else None
+    queryset = User.objects.filter(id=single.id) if single else users
+    queryset.update(token_version=F('token_version') + 1)
+
+    versions = dict(User.objects.filter(id__in=queryset.values('id')).values_list('id', 'token_version'))
+    _cache_versions(versions)
+    if single:
+        single.token_version = versions[single.id]
+
+
+class ClaimsJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    Cookie/header JWT auth that builds request.user from the token claims instead
+    of loading the users.User row: an unsaved User carrying id, username and
+    is_kyc_verified (enough for ownership filters and the KYC gate).
+    The only per-request check is the token version in the shared cache; when
+    it moved on (or is unknown) the user is loaded from the DB as usual, so
+    revocation and KYC changes apply immediately.
+    JWT_STATELESS_USER=False turns the claims path off (every request loads the row).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        version = validated_token.get(VERSION_CLAIM)
+
+        if settings.JWT_STATELESS_USER and user_id is not None and version is not None:
+            # The claim is a str: typed like a loaded row's pk, so the stand-in compares equal to it
+            try:
+                user_id = User._meta.pk.to_python(user_id)
+            except ValidationError:
+                raise AuthenticationFailed("Token contained no recognizable user identification", code="bad_user_id")
+            try:
+                current = cache.get(VERSION_KEY.format(user_id))
+            except Exception:
+                current = None
+            if current == version:
+                return User(
+                    id=user_id,
+                    username=validated_token.get(USERNAME_CLAIM, ''),
+                    is_kyc_verified=validated_token.get(KYC_CLAIM, False),
+                    token_version=version,
+                    is_active=True,
+                )
+
+        # Stale, pre-claims or unverified token: fall back to the row (also refreshes the cached version)
+        user = super().get_user(validated_token)
+        _cache_versions({user.id: user.token_version})
+        return user
+
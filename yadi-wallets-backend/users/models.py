@@ -44,6 +44,10 @@ class User(AbstractUser):
         help_text="Percentage taken from Ticket Sales (e.g. 4.00)"
     )
 
+    # --- TOKEN VERSION ---
+    # Baked into issued JWTs (users.authentication); bumping it makes their claims stale
+    token_version = models.PositiveIntegerField(default=0)
+
     # --- OTP FIELDS ---
     otp_code = models.CharField(max_length=6, blank=True, null=True)
     otp_created_at = models.DateTimeField(blank=True, null=True)
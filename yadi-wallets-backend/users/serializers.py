@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import User
+from .authentication import bump_token_versions
 
 class UserProfileSerializer(serializers.ModelSerializer):
     # Allow writing phone_number
@@ -29,9 +30,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
         
         # LITE KYC LOGIC:
         # If they provided a phone number AND asked to verify -> Auto Verify
+        kyc_changed = should_verify and instance.phone_number and not instance.is_kyc_verified
         if should_verify and instance.phone_number:
             instance.is_kyc_verified = True
             instance.kyc_rejection_reason = None # Clear any past rejections
         
         instance.save()
+        if kyc_changed:
+            bump_token_versions(instance)
         return instance
\ No newline at end of file
@@ -1,3 +1,50 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from finance.models import Currency, Transaction, Wallet
+from .authentication import ClaimsJWTCookieAuthentication, WalletTokenClaimsSerializer, _cache_versions
+from .models import User
+
+# Token versions need a working cache, whatever CACHE_URL points at
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(JWT_STATELESS_USER=True, CACHES=LOCAL_CACHE)
+class ClaimsTransferTests(TestCase):
+    """Transfers authenticated from the JWT claims alone (no user row loaded)."""
+
+    def setUp(self):
+        currency, _ = Currency.objects.get_or_create(code='KES', defaults={'name': 'Kenya Shilling', 'symbol': 'KSh'})
+        self.user = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass', phone_number='254700000001'
+        )
+        self.wallet = Wallet.objects.create(
+            owner=self.user, currency=currency, wallet_type=Wallet.Type.CUSTOMER, balance=Decimal('100.00')
+        )
+
+        access = WalletTokenClaimsSerializer.get_token(self.user).access_token
+        _cache_versions({self.user.id: self.user.token_version})
+        self.token = access
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_claims_user_equals_db_user(self):
+        claims_user = ClaimsJWTCookieAuthentication().get_user(self.token)
+        self.assertTrue(claims_user._state.adding) # the stand-in, not a loaded row
+        self.assertEqual(claims_user, self.user)
+
+    def test_p2p_transfer_to_self_is_rejected(self):
+        for identifier in (self.user.email, self.user.phone_number):
+            response = self.client.post('/api/finance/transfer/', {
+                'source_wallet_id': str(self.wallet.id),
+                'recipient_identifier': identifier,
+                'amount': '10.00',
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("self-transfers", response.json()['error'])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
@@ -12,6 +12,9 @@ from dj_rest_auth.registration.views import SocialLoginView
 from allauth.socialaccount.providers.oauth2.client import OAuth2Client
 from integrations.tasks import send_email_task
 from django.conf import settings
+from dj_rest_auth.jwt_auth import set_jwt_cookies
+from dj_rest_auth.utils import jwt_encode
+from .authentication import bump_token_versions
 
 
 
@@ -135,6 +138,11 @@ class VerifyAccountView(APIView):
             user.is_kyc_verified = True
             user.otp_code = None # Clear OTP after use
             user.save()
-            return Response({"status": "verified", "message": "Account verified successfully"})
+
+            # Old tokens claim kyc=false: retire them and hand this browser fresh ones
+            bump_token_versions(user)
+            response = Response({"status": "verified", "message": "Account verified successfully"})
+            set_jwt_cookies(response, *jwt_encode(user))
+            return response
             
         return Response({"error": "Invalid or expired OTP"}, status=400)
\ No newline at end of file